@@ -0,0 +1,167 @@
+""" Compare the memory-mapped cache of the mmap-cache option with Django's
+local memory and file based caches.
+
+Each backend is timed for sets, hits and misses in one process, then a
+number of forked workers run a read-through workload (get, and set on a
+miss) over a shared set of keys, as prefork workers serving the same pages
+would, and the combined throughput and hit rate are reported. With the local
+memory cache every worker has to fill its own copy::
+
+    bin/python benchmarks/cache_backends.py --workers 8 --operations 20000
+"""
+
+from __future__ import print_function
+
+import multiprocessing
+import optparse
+import os
+import shutil
+import tempfile
+import time
+
+DIRECTORY = tempfile.mkdtemp(prefix="cache-backends-")
+
+BACKENDS = [
+    ("locmem", {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "benchmark",
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    }),
+    ("filebased", {
+        "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+        "LOCATION": os.path.join(DIRECTORY, "files"),
+        "OPTIONS": {"MAX_ENTRIES": 100000},
+    }),
+    ("mmap", {
+        "BACKEND": "isotoma.recipe.django.mmapcache.MmapCache",
+        "LOCATION": os.path.join(DIRECTORY, "cache.mmap"),
+        "OPTIONS": {"SIZE": 64 * 1024 * 1024},
+    }),
+]
+
+
+def configure():
+    from django.conf import settings
+    settings.configure(
+        CACHES=dict(
+            [("default", BACKENDS[0][1])] +
+            [(name, config) for name, config in BACKENDS]
+        ),
+    )
+
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+
+
+def get_cache(name):
+    try:
+        from django.core.cache import caches
+    except ImportError:
+        from django.core.cache import get_cache
+        return get_cache(name)
+    return caches[name]
+
+
+def rate(operations, seconds):
+    return "%10.0f/s" % (operations / seconds)
+
+
+def single_process(name, options):
+    cache = get_cache(name)
+    cache.clear()
+    value = "x" * options.value_size
+    keys = ["key:%d" % i for i in range(options.keys)]
+
+    started = time.time()
+    for key in keys:
+        cache.set(key, value)
+    sets = time.time() - started
+
+    started = time.time()
+    hits = 0
+    for key in keys:
+        if cache.get(key) is not None:
+            hits += 1
+    gets = time.time() - started
+
+    started = time.time()
+    for key in keys:
+        cache.get("missing:" + key)
+    misses = time.time() - started
+
+    print("%-10s set %s  hit %s  miss %s  (%d of %d kept)" % (
+        name,
+        rate(len(keys), sets),
+        rate(len(keys), gets),
+        rate(len(keys), misses),
+        hits,
+        len(keys)
+    ))
+
+
+def read_through(job):
+    name, options, seed = job
+    import random
+    randomness = random.Random(seed)
+    cache = get_cache(name)
+    value = "x" * options.value_size
+
+    hits = 0
+    started = time.time()
+    for i in range(options.operations):
+        key = "page:%d" % randomness.randint(0, options.keys - 1)
+        if cache.get(key) is None:
+            cache.set(key, value)
+        else:
+            hits += 1
+    return hits, time.time() - started
+
+
+def multi_process(name, options):
+    get_cache(name).clear()
+    pool = multiprocessing.Pool(options.workers)
+    try:
+        results = pool.map(read_through, [
+            (name, options, seed) for seed in range(options.workers)
+        ])
+    finally:
+        pool.close()
+        pool.join()
+
+    operations = options.workers * options.operations
+    hits = sum(result[0] for result in results)
+    seconds = max(result[1] for result in results)
+    print("%-10s %d workers %s  hit rate %5.1f%%" % (
+        name,
+        options.workers,
+        rate(operations, seconds),
+        100.0 * hits / operations
+    ))
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--keys", type="int", default=5000,
+                      help="distinct keys [%default]")
+    parser.add_option("--value-size", type="int", default=1000,
+                      help="bytes in each value [%default]")
+    parser.add_option("--workers", type="int", default=4,
+                      help="worker processes [%default]")
+    parser.add_option("--operations", type="int", default=20000,
+                      help="read-through operations per worker [%default]")
+    options, args = parser.parse_args()
+
+    try:
+        configure()
+        for name, config in BACKENDS:
+            single_process(name, options)
+        print("")
+        for name, config in BACKENDS:
+            multi_process(name, options)
+    finally:
+        shutil.rmtree(DIRECTORY)
+
+
+if __name__ == "__main__":
+    main()
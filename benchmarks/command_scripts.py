@@ -0,0 +1,89 @@
+""" Compare starting a command through the control script with starting it
+through the dedicated script generated by the commands option.
+
+Each script is run with the command's --help, which loads the command and
+exits before doing any work, and the median wall time and the number of
+modules imported are reported. Run it from a buildout with the commands
+option set::
+
+    bin/python benchmarks/command_scripts.py migrate
+"""
+
+from __future__ import print_function
+
+import json
+import optparse
+import os
+import subprocess
+import sys
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def profile(script, args, options):
+    """ Return (seconds, modules imported) for a run of script """
+    fd, output = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        subprocess.call(
+            [
+                options.python,
+                os.path.join(HERE, "import_profile.py"),
+                output,
+                script,
+            ] + args,
+            stdout=open(os.devnull, "w"),
+            stderr=open(os.devnull, "w")
+        )
+        result = json.load(open(output))
+    finally:
+        os.remove(output)
+    return result["total"], len(result["modules"])
+
+
+def measure(label, script, args, options):
+    runs = [profile(script, args, options) for i in range(options.runs)]
+    seconds = sorted(run[0] for run in runs)[len(runs) // 2]
+    print("%-30s %8.1fms %6d modules" % (label, seconds * 1000, runs[0][1]))
+    return seconds
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options] COMMAND")
+    parser.add_option("--runs", type="int", default=5,
+                      help="runs of each script [%default]")
+    parser.add_option("--control-script", default="django",
+                      help="name of the control script [%default]")
+    parser.add_option("--bin-directory", default="bin",
+                      help="buildout bin directory [%default]")
+    parser.add_option("--python", default=sys.executable,
+                      help="interpreter to run the scripts with [%default]")
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error("expected the name of a management command")
+    command = args[0]
+
+    control = os.path.join(options.bin_directory, options.control_script)
+    dedicated = "%s-%s" % (control, command)
+    if not os.path.exists(dedicated):
+        parser.error("%s does not exist, add %s to the commands option" % (
+            dedicated,
+            command
+        ))
+
+    before = measure(
+        "%s %s" % (control, command),
+        control,
+        [command, "--help"],
+        options
+    )
+    after = measure(dedicated, dedicated, ["--help"], options)
+    print("")
+    print("%.0f%% of the control script's start up time" % (
+        100 * after / before
+    ))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+""" Measure how much of a request's latency is spent opening its database
+connection, and how much of that the db-conn-max-age and db-pool options
+remove.
+
+Django is configured here with three aliases of the same SQLite database: one
+closing its connection after each request (CONN_MAX_AGE = 0, Django's
+default), one with a persistent connection, and one closing its connection
+into the pool. SQLite connects in microseconds, so connecting is slowed down
+by --connect-latency milliseconds to stand in for the network round trips
+and authentication of a database server. A view that runs one query on the
+alias named in the URL is called through Django's handler in-process, and
+the median and 99th percentile latency are reported::
+
+    bin/python benchmarks/db_connections.py --connect-latency 3
+"""
+
+from __future__ import print_function
+
+import optparse
+import os
+import shutil
+import tempfile
+import time
+
+DIRECTORY = tempfile.mkdtemp(prefix="db-connections-")
+
+urlpatterns = []
+
+CASES = [
+    ("close", "CONN_MAX_AGE = 0"),
+    ("persistent", "CONN_MAX_AGE = 60"),
+    ("pooled", "CONN_MAX_AGE = 0, db-pool"),
+]
+
+
+def configure(options):
+    database = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": os.path.join(DIRECTORY, "db.sqlite"),
+    }
+    databases = {}
+    for alias, description in CASES:
+        databases[alias] = dict(database)
+        databases[alias]["CONN_MAX_AGE"] = alias == "persistent" and 60 or 0
+    databases["default"] = databases["close"]
+
+    from django.conf import settings
+    settings.configure(
+        DEBUG=False,
+        ALLOWED_HOSTS=["*"],
+        ROOT_URLCONF=__name__,
+        SECRET_KEY="benchmark",
+        MIDDLEWARE=[],
+        MIDDLEWARE_CLASSES=[],
+        INSTALLED_APPS=[],
+        DATABASES=databases,
+    )
+
+    # a database server takes longer to connect to than a file
+    from django.db.backends.sqlite3.base import DatabaseWrapper
+    get_new_connection = DatabaseWrapper.get_new_connection
+
+    def slow_get_new_connection(self, conn_params):
+        time.sleep(options.connect_latency / 1000.0)
+        return get_new_connection(self, conn_params)
+    DatabaseWrapper.get_new_connection = slow_get_new_connection
+
+    from isotoma.recipe.django import dbpool
+    dbpool.install({"pooled": databases["pooled"]}, pre_ping=True)
+
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+
+    from django.db import connections
+    from django.http import HttpResponse
+    try:
+        from django.urls import re_path as url
+    except ImportError:
+        from django.conf.urls import url
+
+    def view(request, alias):
+        cursor = connections[alias].cursor()
+        cursor.execute("SELECT 1")
+        return HttpResponse(str(cursor.fetchall()))
+
+    urlpatterns.append(url(r"^(?P<alias>\w+)/$", view))
+
+
+def send_request(application, path):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "SCRIPT_NAME": "",
+        "QUERY_STRING": "",
+    }
+    setup_testing_defaults(environ)
+
+    started = time.time()
+    response = application(environ, lambda status, headers: None)
+    for data in response:
+        pass
+    response.close()
+    return time.time() - started
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--requests", type="int", default=500,
+                      help="requests for each case [%default]")
+    parser.add_option("--connect-latency", type="float", default=2.0,
+                      help="milliseconds added to each new connection "
+                           "[%default]")
+    options, args = parser.parse_args()
+
+    try:
+        configure(options)
+
+        from django.core.wsgi import get_wsgi_application
+        application = get_wsgi_application()
+
+        for alias, description in CASES:
+            path = "/%s/" % alias
+            send_request(application, path)
+            latencies = sorted(
+                send_request(application, path)
+                for i in range(options.requests)
+            )
+            print("%-32s median %7.2fms  p99 %7.2fms" % (
+                description,
+                latencies[len(latencies) // 2] * 1000,
+                latencies[int(len(latencies) * 0.99)] * 1000
+            ))
+    finally:
+        shutil.rmtree(DIRECTORY)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+""" Run a script and record how long each module took to import.
+
+    python import_profile.py OUTPUT SCRIPT [ARGS...]
+
+Every import that is not already in sys.modules is timed, and the time spent
+importing the module itself (excluding the imports it triggers) is written to
+OUTPUT as JSON, along with the time until the script finished. Used by
+startup.py; it works the same way on Python 2 and 3.
+"""
+
+import json
+import sys
+import time
+
+try:
+    import __builtin__ as builtins
+except ImportError:
+    import builtins
+
+
+def main():
+    output, script = sys.argv[1], sys.argv[2]
+    sys.argv = sys.argv[2:]
+
+    _import = builtins.__import__
+    self_times = {}
+    stack = []
+
+    def timed_import(name, *args, **kwargs):
+        if name in sys.modules:
+            return _import(name, *args, **kwargs)
+
+        stack.append(0.0)
+        started = time.time()
+        try:
+            return _import(name, *args, **kwargs)
+        finally:
+            elapsed = time.time() - started
+            children = stack.pop()
+            self_times[name] = self_times.get(name, 0.0) + elapsed - children
+            if stack:
+                stack[-1] += elapsed
+
+    started = time.time()
+    builtins.__import__ = timed_import
+    status = 0
+    try:
+        namespace = {"__file__": script, "__name__": "__main__"}
+        exec(compile(open(script).read(), script, "exec"), namespace)
+    except SystemExit:
+        status = sys.exc_info()[1].code or 0
+    finally:
+        builtins.__import__ = _import
+
+    result = open(output, "w")
+    json.dump({
+        "total": time.time() - started,
+        "modules": self_times,
+    }, result)
+    result.close()
+
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+""" Measure the per-request cost of the instrument option.
+
+A trivial wsgi application and Django's handler (configured here with a
+single named view) are called in-process, plain and wrapped in the
+instrumentation, with and without a collector reading the datagrams, and the
+time per request and the overhead are reported::
+
+    bin/python benchmarks/instrument_overhead.py --requests 20000
+"""
+
+from __future__ import print_function
+
+import optparse
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+
+urlpatterns = []
+
+
+def configure():
+    from django.conf import settings
+    settings.configure(
+        DEBUG=False,
+        ALLOWED_HOSTS=["*"],
+        ROOT_URLCONF=__name__,
+        SECRET_KEY="benchmark",
+        MIDDLEWARE=[],
+        MIDDLEWARE_CLASSES=[],
+        INSTALLED_APPS=[],
+    )
+
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+
+    from django.http import HttpResponse
+    try:
+        from django.urls import re_path as url
+    except ImportError:
+        from django.conf.urls import url
+    urlpatterns.append(url(
+        r"^items/(?P<pk>\d+)/$",
+        lambda request, pk: HttpResponse("item %s" % pk),
+        name="item"
+    ))
+
+
+def trivial_application(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain")])
+    return [b"hello world"]
+
+
+def send_requests(application, count):
+    from wsgiref.util import setup_testing_defaults
+
+    def start_response(status, headers, exc_info=None):
+        return lambda data: None
+
+    environs = []
+    for i in range(count):
+        environ = {
+            "REQUEST_METHOD": "GET",
+            # a few distinct paths, as a real worker would see
+            "PATH_INFO": "/items/%d/" % (i % 100),
+            "SCRIPT_NAME": "",
+            "QUERY_STRING": "",
+        }
+        setup_testing_defaults(environ)
+        environs.append(environ)
+
+    started = time.time()
+    for environ in environs:
+        response = application(environ, start_response)
+        for data in response:
+            pass
+        if hasattr(response, "close"):
+            response.close()
+    return time.time() - started
+
+
+def listen(socket_path, received):
+    collector = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    collector.bind(socket_path)
+
+    def receive():
+        while True:
+            data = collector.recv(65536 * 4)
+            if not data:
+                break
+            received.append(len(data))
+
+    thread = threading.Thread(target=receive)
+    thread.daemon = True
+    thread.start()
+    return collector
+
+
+def measure(label, application, options, baseline=None):
+    # the first pass warms up URL resolution and the caches
+    send_requests(application, min(options.requests, 1000))
+    seconds = min(
+        send_requests(application, options.requests)
+        for i in range(options.runs)
+    )
+    per_request = seconds / options.requests * 1000000
+    if baseline is None:
+        print("%-44s %8.2fus" % (label, per_request))
+    else:
+        print("%-44s %8.2fus  %+7.2fus" % (
+            label,
+            per_request,
+            per_request - baseline
+        ))
+    return per_request
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--requests", type="int", default=10000,
+                      help="requests in each run [%default]")
+    parser.add_option("--runs", type="int", default=3,
+                      help="runs of each case, the fastest is reported "
+                           "[%default]")
+    parser.add_option("--interval", type="float", default=1.0,
+                      help="seconds between datagrams [%default]")
+    options, args = parser.parse_args()
+
+    configure()
+
+    from django.core.wsgi import get_wsgi_application
+    from isotoma.recipe.django.instrument import Instrument
+
+    directory = tempfile.mkdtemp(prefix="instrument-")
+    socket_path = os.path.join(directory, "metrics.sock")
+    try:
+        for label, application in [
+                ("trivial", trivial_application),
+                ("django", get_wsgi_application())]:
+            baseline = measure(label, application, options)
+            measure(
+                "%s, instrumented, no collector" % label,
+                Instrument(application, socket_path,
+                           interval=options.interval),
+                options,
+                baseline
+            )
+
+            received = []
+            collector = listen(socket_path, received)
+            measure(
+                "%s, instrumented, collector" % label,
+                Instrument(application, socket_path,
+                           interval=options.interval),
+                options,
+                baseline
+            )
+            collector.close()
+            os.remove(socket_path)
+            print("%-44s %8d datagrams" % ("", len(received)))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
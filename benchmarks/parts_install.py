@@ -0,0 +1,143 @@
+""" Install time of buildouts with many django parts sharing the same eggs.
+
+For each number of parts, a buildout extending the test buildout is written
+with that many parts (one control script each), and is installed from
+scratch (after removing .installed.cfg)
+
+ - with working-set-cache = false, so every part resolves its eggs,
+ - with the cache, but no cache file, so the first part resolves them and
+   the others share its working set, and
+ - with the cache file left by the previous run.
+
+Each is run several times and the median reported, along with a re-run of the
+installed buildout, which resolves the working sets to check the parts'
+fingerprints. Run it from the root of a bootstrapped checkout::
+
+    bin/python benchmarks/parts_install.py --parts 1,10,50
+"""
+
+from __future__ import print_function
+
+import optparse
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+BUILDOUT_TEMPLATE = """\
+[buildout]
+extends = %(root)s/buildout.cfg
+parts =
+%(parts)s
+develop =
+    %(root)s
+    %(root)s/test
+eggs-directory = %(eggs_directory)s
+newest = false
+%(sections)s
+"""
+
+PART_TEMPLATE = """
+[%(name)s]
+recipe = isotoma.recipe.django
+project = test_project
+control-script = %(name)s
+eggs = ${buildout:eggs}
+working-set-cache = %(cache)s
+"""
+
+CACHE_FILE = os.path.join("parts", "isotoma.recipe.django-working-sets.json")
+
+
+def write_config(directory, count, cache):
+    names = ["site%03d" % i for i in range(count)]
+    config = os.path.join(directory, "buildout.cfg")
+    open(config, "w").write(BUILDOUT_TEMPLATE % {
+        "root": ROOT,
+        "parts": "\n".join("    %s" % name for name in names),
+        "eggs_directory": os.path.join(ROOT, "eggs"),
+        "sections": "".join(
+            PART_TEMPLATE % {"name": name, "cache": cache}
+            for name in names
+        ),
+    })
+    return config
+
+
+def run(directory, config, options):
+    started = time.time()
+    subprocess.check_call(
+        [options.buildout, "-q", "-c", config],
+        cwd=directory,
+        stdout=open(os.devnull, "w")
+    )
+    return time.time() - started
+
+
+def install(directory, config, options, keep_cache):
+    """ Install from scratch, returning the time taken """
+    installed = os.path.join(directory, ".installed.cfg")
+    if os.path.exists(installed):
+        os.remove(installed)
+    cache = os.path.join(directory, CACHE_FILE)
+    if not keep_cache and os.path.exists(cache):
+        os.remove(cache)
+    return run(directory, config, options)
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def measure(label, timings):
+    print("  %-16s %8.2fs" % (label, median(timings)))
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--parts", default="1,10,50",
+                      help="comma separated numbers of parts [%default]")
+    parser.add_option("--runs", type="int", default=3,
+                      help="runs per measurement [%default]")
+    parser.add_option("--buildout",
+                      default=os.path.join(ROOT, "bin", "buildout"),
+                      help="buildout script [%default]")
+    options, args = parser.parse_args()
+
+    for count in [int(count) for count in options.parts.split(",")]:
+        print("%d parts" % count)
+        directory = tempfile.mkdtemp(prefix="parts-install-")
+        try:
+            config = write_config(directory, count, "false")
+            measure("uncached", [
+                install(directory, config, options, False)
+                for i in range(options.runs)
+            ])
+
+            config = write_config(directory, count, "true")
+            measure("cached, cold", [
+                install(directory, config, options, False)
+                for i in range(options.runs)
+            ])
+            measure("cached, warm", [
+                install(directory, config, options, True)
+                for i in range(options.runs)
+            ])
+            measure("re-run", [
+                run(directory, config, options)
+                for i in range(options.runs)
+            ])
+        finally:
+            shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+""" Measure how much memory workers forked from a generated wsgi script share.
+
+The script is loaded in this process, the way a preloading master loads it,
+then N workers are forked. Each worker sends some requests through the
+application and runs the garbage collector, as a worker that has been serving
+for a while would, and then waits while its /proc/<pid>/smaps is read.
+
+    bin/python benchmarks/prefork_memory.py --workers 8 --path / bin/django.wsgi
+
+Run it against scripts generated with and without wsgi-gc-freeze, or pass
+--freeze to freeze the heap here after loading the script.
+"""
+
+from __future__ import print_function
+
+import gc
+import optparse
+import os
+import signal
+
+
+def load_application(script):
+    namespace = {"__file__": script, "__name__": "__wsgi__"}
+    code = compile(open(script).read(), script, "exec")
+    exec(code, namespace)
+    return namespace["application"]
+
+
+def send_request(application, path):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path}
+    setup_testing_defaults(environ)
+
+    def start_response(status, headers, exc_info=None):
+        return lambda data: None
+
+    response = application(environ, start_response)
+    for data in response:
+        pass
+    if hasattr(response, "close"):
+        response.close()
+
+
+def read_smaps(pid):
+    """ Return the shared, private and proportional memory of pid in kB """
+    totals = {"Shared": 0, "Private": 0, "Pss": 0}
+    for line in open("/proc/%d/smaps" % pid):
+        parts = line.split()
+        if len(parts) != 3 or parts[2] != "kB":
+            continue
+        field = parts[0].rstrip(":")
+        if field in ("Shared_Clean", "Shared_Dirty"):
+            totals["Shared"] += int(parts[1])
+        elif field in ("Private_Clean", "Private_Dirty"):
+            totals["Private"] += int(parts[1])
+        elif field == "Pss":
+            totals["Pss"] += int(parts[1])
+    return totals
+
+
+def run_worker(application, options, ready):
+    for i in range(options.requests):
+        send_request(application, options.path)
+    gc.collect()
+    os.write(ready, "r".encode("ascii"))
+    signal.pause()
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options] WSGI_SCRIPT")
+    parser.add_option("--workers", type="int", default=4,
+                      help="number of workers to fork [%default]")
+    parser.add_option("--requests", type="int", default=100,
+                      help="requests each worker serves first [%default]")
+    parser.add_option("--path", default="/",
+                      help="path requested by the workers [%default]")
+    parser.add_option("--freeze", action="store_true", default=False,
+                      help="freeze the heap after loading the script")
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error("expected the path of a generated wsgi script")
+
+    application = load_application(args[0])
+    if options.freeze:
+        from isotoma.recipe.django.memory import freeze_heap
+        freeze_heap()
+
+    read_end, write_end = os.pipe()
+    workers = []
+    for i in range(options.workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            try:
+                run_worker(application, options, write_end)
+            finally:
+                os._exit(0)
+        workers.append(pid)
+    os.close(write_end)
+
+    # wait until every worker has finished its requests
+    for pid in workers:
+        os.read(read_end, 1)
+
+    master = read_smaps(os.getpid())
+    print("%-10s %12s %12s %12s" % ("process", "shared kB", "private kB",
+                                    "pss kB"))
+    print("%-10s %12d %12d %12d" % ("master", master["Shared"],
+                                    master["Private"], master["Pss"]))
+
+    total_private = 0
+    total_shared = 0
+    try:
+        for pid in workers:
+            usage = read_smaps(pid)
+            total_private += usage["Private"]
+            total_shared += usage["Shared"]
+            print("%-10d %12d %12d %12d" % (pid, usage["Shared"],
+                                            usage["Private"], usage["Pss"]))
+    finally:
+        for pid in workers:
+            os.kill(pid, signal.SIGTERM)
+            os.waitpid(pid, 0)
+
+    print("")
+    print("mean per worker: %d kB shared, %d kB private (%.0f%% shared)" % (
+        total_shared / len(workers),
+        total_private / len(workers),
+        100.0 * total_shared / max(total_shared + total_private, 1)
+    ))
+
+
+if __name__ == "__main__":
+    main()
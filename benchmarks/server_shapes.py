@@ -0,0 +1,197 @@
+""" Compare the throughput of gunicorn running the generated wsgi script with
+a few shapes of workers and threads, including the one server-config sizes
+for this host.
+
+For each shape a gunicorn configuration is written with the recipe's
+serverconfig module, gunicorn is started with it on a local port, and a
+number of client threads send GET requests for --path for --seconds. The
+requests per second, the median and 99th percentile latency and the number
+of failed requests are reported::
+
+    bin/python benchmarks/server_shapes.py --shapes 1x1,2x1,4x1,2x4
+
+Each shape is written as workers x threads. gunicorn is run from
+bin/gunicorn, which the gunicorn part of buildout.cfg builds (see
+--gunicorn); the client runs in this process, so for fast views on big hosts
+raise --concurrency until the client is no longer the bottleneck.
+"""
+
+from __future__ import print_function
+
+import optparse
+import os
+import shutil
+import signal
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+
+try:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen, HTTPError
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+from isotoma.recipe.django import serverconfig
+
+
+def write_config(directory, script, bind, workers, threads):
+    """ Write a loader module and gunicorn configuration for the shape to
+    directory, returning the configuration's path and settings """
+    open(os.path.join(directory, "benchmark_wsgiapp.py"), "w").write(
+        serverconfig.LOADER_TEMPLATE % {
+            "name": os.path.basename(script),
+            "base": "",
+            "script": repr(os.path.abspath(script)),
+        }
+    )
+
+    options = {"bind": bind}
+    if workers is not None:
+        options["workers"] = str(workers)
+        options["threads"] = str(threads)
+    settings = serverconfig.size(
+        options,
+        serverconfig.cpu_count(),
+        serverconfig.memory()
+    )
+    path = os.path.join(directory, "gunicorn.conf.py")
+    open(path, "w").write(serverconfig.gunicorn_config(
+        settings,
+        "this benchmark",
+        "",
+        repr(directory),
+        "benchmark_wsgiapp:application"
+    ))
+    return path, settings
+
+
+def free_port():
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    port = listener.getsockname()[1]
+    listener.close()
+    return port
+
+
+def wait_for(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urlopen(url).read()
+            return
+        except HTTPError:
+            return
+        except (IOError, OSError):
+            time.sleep(0.1)
+    raise RuntimeError("The server did not start")
+
+
+def load(url, concurrency, seconds):
+    """ Send requests from concurrency threads for seconds, returning the
+    latencies of the successful ones and the number that failed """
+    latencies = []
+    failures = [0]
+    lock = threading.Lock()
+    deadline = time.time() + seconds
+
+    def client():
+        while time.time() < deadline:
+            started = time.time()
+            try:
+                response = urlopen(url)
+                response.read()
+                ok = True
+            except HTTPError as e:
+                ok = e.code < 500
+            except (IOError, OSError):
+                ok = False
+            elapsed = time.time() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    failures[0] += 1
+
+    clients = [threading.Thread(target=client) for i in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    return sorted(latencies), failures[0]
+
+
+def measure(label, options, workers=None, threads=None):
+    directory = tempfile.mkdtemp(prefix="server-shapes-")
+    port = free_port()
+    config, settings = write_config(
+        directory,
+        options.script,
+        "127.0.0.1:%d" % port,
+        workers,
+        threads
+    )
+    # the application is also passed on the command line, since gunicorn
+    # only reads wsgi_app from the configuration from 20.1
+    server = subprocess.Popen(
+        [options.gunicorn, "-c", config, "benchmark_wsgiapp:application"],
+        stdout=open(os.devnull, "w"),
+        stderr=open(os.devnull, "w")
+    )
+    try:
+        url = "http://127.0.0.1:%d%s" % (port, options.path)
+        wait_for(url)
+        # every worker serves its first requests before the measurement
+        load(url, options.concurrency, 1)
+        latencies, failures = load(url, options.concurrency, options.seconds)
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+        shutil.rmtree(directory)
+
+    if not latencies:
+        print("%-12s no successful requests, %d failed" % (label, failures))
+        return
+    print("%-12s %2dx%-2d %8.1f req/s  median %7.2fms  p99 %7.2fms  "
+          "%d failed" % (
+              label,
+              settings["workers"],
+              settings["threads"],
+              len(latencies) / float(options.seconds),
+              latencies[len(latencies) // 2] * 1000,
+              latencies[int(len(latencies) * 0.99)] * 1000,
+              failures
+          ))
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--shapes", default="1x1,2x1,4x1,2x4",
+                      help="comma separated workers x threads [%default]")
+    parser.add_option("--script",
+                      default=os.path.join(ROOT, "bin", "django.wsgi"),
+                      help="wsgi script [%default]")
+    parser.add_option("--gunicorn",
+                      default=os.path.join(ROOT, "bin", "gunicorn"),
+                      help="gunicorn script [%default]")
+    parser.add_option("--path", default="/",
+                      help="path to request [%default]")
+    parser.add_option("--concurrency", type="int", default=16,
+                      help="client threads [%default]")
+    parser.add_option("--seconds", type="float", default=10,
+                      help="duration of each load test [%default]")
+    options, args = parser.parse_args()
+
+    measure("sized", options)
+    for shape in options.shapes.split(","):
+        workers, threads = [int(value) for value in shape.split("x")]
+        measure(shape, options, workers, threads)
+
+
+if __name__ == "__main__":
+    main()
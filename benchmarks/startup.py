@@ -0,0 +1,260 @@
+""" Startup latency of the scripts generated by the recipe.
+
+For each working set size, a copy of the test buildout is built with that many
+synthetic develop eggs added to the django part, and then
+
+ - bin/django.wsgi is run until the ``application`` is ready, and
+ - bin/django check (or --check-command) is run,
+
+first cold (after dropping the page cache, if we are allowed to) and then warm,
+several times. A per-module import time breakdown of the wsgi script is
+reported for each size. Run it from the root of a bootstrapped checkout::
+
+    bin/python benchmarks/startup.py --eggs 10,100,500
+
+With --save-baseline the warm medians are stored in
+benchmarks/startup-baseline.json; later runs fail with a non-zero exit status
+if a median is more than --tolerance slower than the stored one.
+"""
+
+from __future__ import print_function
+
+import json
+import optparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+BUILDOUT_TEMPLATE = """\
+[buildout]
+extends = %(root)s/buildout.cfg
+parts = django
+develop =
+    %(root)s
+    %(root)s/test
+%(develop)s
+eggs-directory = %(eggs_directory)s
+eggs =
+    test_project
+%(eggs)s
+newest = false
+"""
+
+SETUP_TEMPLATE = """\
+from setuptools import setup
+
+setup(
+    name=%(name)r,
+    version='1.0',
+    packages=[%(name)r],
+    zip_safe=False,
+)
+"""
+
+
+def make_eggs(directory, count):
+    """ Create count synthetic develop eggs, returning their directories """
+    eggs = []
+    for i in range(count):
+        name = "synthetic_egg_%04d" % i
+        egg_dir = os.path.join(directory, name)
+        os.makedirs(os.path.join(egg_dir, name))
+        open(os.path.join(egg_dir, "setup.py"), "w").write(
+            SETUP_TEMPLATE % {"name": name}
+        )
+        open(os.path.join(egg_dir, name, "__init__.py"), "w").write(
+            "VALUE = %d\n" % i
+        )
+        eggs.append(egg_dir)
+    return eggs
+
+
+def build(directory, count, options):
+    """ Build the test buildout with count synthetic eggs in directory """
+    eggs = make_eggs(os.path.join(directory, "eggs-src"), count)
+    config = os.path.join(directory, "buildout.cfg")
+    open(config, "w").write(BUILDOUT_TEMPLATE % {
+        "root": ROOT,
+        "develop": "\n".join("    %s" % egg for egg in eggs),
+        "eggs": "\n".join("    %s" % os.path.basename(egg) for egg in eggs),
+        "eggs_directory": options.eggs_directory,
+    })
+    subprocess.check_call(
+        [options.buildout, "-q", "-c", config],
+        stdout=open(os.devnull, "w")
+    )
+
+
+def drop_caches():
+    """ Drop the page cache, returning False if we are not allowed to """
+    try:
+        subprocess.check_call(["sync"])
+        open("/proc/sys/vm/drop_caches", "w").write("3\n")
+    except (IOError, OSError, subprocess.CalledProcessError):
+        return False
+    return True
+
+
+def timed(command, cwd):
+    started = time.time()
+    subprocess.check_call(
+        command,
+        cwd=cwd,
+        stdout=open(os.devnull, "w"),
+        stderr=open(os.devnull, "w")
+    )
+    return time.time() - started
+
+
+def median(values):
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2.0
+
+
+def measure(name, command, cwd, options):
+    """ Time command cold and warm, returning (cold, warm median) """
+    dropped = drop_caches()
+    cold = timed(command, cwd)
+    warm = median([timed(command, cwd) for i in range(options.runs)])
+    print("  %-10s %s %7.1fms   warm %7.1fms" % (
+        name,
+        "cold " if dropped else "first",
+        cold * 1000,
+        warm * 1000
+    ))
+    return cold, warm
+
+
+def import_breakdown(directory, options):
+    """ Print the modules the wsgi script spends most time importing """
+    output = os.path.join(directory, "imports.json")
+    subprocess.check_call(
+        [
+            options.python,
+            os.path.join(HERE, "import_profile.py"),
+            output,
+            os.path.join("bin", "django.wsgi")
+        ],
+        cwd=directory,
+        stdout=open(os.devnull, "w"),
+        stderr=open(os.devnull, "w")
+    )
+    profile = json.load(open(output))
+    slowest = sorted(
+        profile["modules"].items(),
+        key=lambda item: item[1],
+        reverse=True
+    )[:options.top]
+
+    print("  slowest imports (self time) of %.1fms:" % (
+        profile["total"] * 1000
+    ))
+    for module, seconds in slowest:
+        print("    %7.1fms  %s" % (seconds * 1000, module))
+
+
+def compare(results, baseline, tolerance):
+    """ Return the measurements that regressed against the baseline """
+    regressions = []
+    for key, warm in sorted(results.items()):
+        if key in baseline and warm > baseline[key] * (1 + tolerance):
+            regressions.append((key, baseline[key], warm))
+    return regressions
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--eggs", default="10,50,100,500",
+                      help="comma separated working set sizes [%default]")
+    parser.add_option("--runs", type="int", default=5,
+                      help="warm runs per measurement [%default]")
+    parser.add_option("--top", type="int", default=10,
+                      help="slowest imports to report [%default]")
+    parser.add_option("--check-command", default="check",
+                      help="management command to time [%default]")
+    parser.add_option("--buildout",
+                      default=os.path.join(ROOT, "bin", "buildout"),
+                      help="buildout script [%default]")
+    parser.add_option("--python", default=sys.executable,
+                      help="interpreter for the import breakdown [%default]")
+    parser.add_option("--eggs-directory",
+                      default=os.path.join(ROOT, "eggs"),
+                      help="shared eggs directory [%default]")
+    parser.add_option("--baseline",
+                      default=os.path.join(HERE, "startup-baseline.json"),
+                      help="baseline file [%default]")
+    parser.add_option("--tolerance", type="float", default=0.2,
+                      help="allowed slowdown against the baseline [%default]")
+    parser.add_option("--save-baseline", action="store_true", default=False,
+                      help="store the results as the new baseline")
+    parser.add_option("--keep", action="store_true", default=False,
+                      help="keep the generated buildouts")
+    options, args = parser.parse_args()
+
+    results = {}
+    for count in [int(size) for size in options.eggs.split(",")]:
+        directory = tempfile.mkdtemp(prefix="startup-%d-" % count)
+        try:
+            print("%d eggs (%s)" % (count, directory))
+            build(directory, count, options)
+
+            cold, warm = measure(
+                "wsgi",
+                [options.python, os.path.join("bin", "django.wsgi")],
+                directory,
+                options
+            )
+            results["wsgi-%d" % count] = warm
+
+            cold, warm = measure(
+                options.check_command,
+                [os.path.join("bin", "django"), options.check_command],
+                directory,
+                options
+            )
+            results["%s-%d" % (options.check_command, count)] = warm
+
+            import_breakdown(directory, options)
+        finally:
+            if options.keep:
+                print("  kept %s" % directory)
+            else:
+                shutil.rmtree(directory)
+
+    if options.save_baseline:
+        baseline = open(options.baseline, "w")
+        json.dump(results, baseline, indent=4, sort_keys=True)
+        baseline.close()
+        print("Saved baseline to %s" % options.baseline)
+        return
+
+    if not os.path.exists(options.baseline):
+        print("No baseline at %s to compare against" % options.baseline)
+        return
+
+    regressions = compare(
+        results,
+        json.load(open(options.baseline)),
+        options.tolerance
+    )
+    for key, before, after in regressions:
+        print("REGRESSION %s: %.1fms -> %.1fms" % (
+            key,
+            before * 1000,
+            after * 1000
+        ))
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,150 @@
+""" Compare serving a static file through the wsgi-static layer with serving
+it through Django's handler and django.views.static.serve.
+
+Django is configured here with a minimal URLconf that serves a temporary
+static root, and both applications are called in-process with the same
+requests, so the numbers measure the work done per request rather than any
+server or network overhead::
+
+    bin/python benchmarks/static_serving.py --requests 5000 --size 20000
+"""
+
+from __future__ import print_function
+
+import optparse
+import os
+import shutil
+import tempfile
+import time
+
+STATIC_ROOT = tempfile.mkdtemp(prefix="static-serving-")
+
+urlpatterns = []
+
+
+def configure():
+    from django.conf import settings
+    settings.configure(
+        DEBUG=False,
+        ALLOWED_HOSTS=["*"],
+        ROOT_URLCONF=__name__,
+        STATIC_ROOT=STATIC_ROOT,
+        STATIC_URL="/static/",
+        SECRET_KEY="benchmark",
+        MIDDLEWARE=[
+            "django.middleware.security.SecurityMiddleware",
+            "django.middleware.common.CommonMiddleware",
+        ],
+        MIDDLEWARE_CLASSES=[
+            "django.middleware.common.CommonMiddleware",
+        ],
+        INSTALLED_APPS=[],
+    )
+
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+
+    from django.views.static import serve
+    try:
+        from django.urls import re_path as url
+    except ImportError:
+        from django.conf.urls import url
+    urlpatterns.append(url(
+        r"^static/(?P<path>.*)$",
+        serve,
+        {"document_root": STATIC_ROOT}
+    ))
+
+
+def send_request(application, path, headers):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "SCRIPT_NAME": "",
+        "QUERY_STRING": "",
+    }
+    environ.update(headers)
+    setup_testing_defaults(environ)
+
+    result = {}
+
+    def start_response(status, headers, exc_info=None):
+        result["status"] = status
+        return lambda data: None
+
+    response = application(environ, start_response)
+    for data in response:
+        pass
+    if hasattr(response, "close"):
+        response.close()
+    return result["status"]
+
+
+def measure(label, application, path, headers, options):
+    status = send_request(application, path, headers)
+    started = time.time()
+    for i in range(options.requests):
+        send_request(application, path, headers)
+    seconds = time.time() - started
+    print("%-40s %10.0f requests/s  (%s)" % (
+        label,
+        options.requests / seconds,
+        status
+    ))
+    return seconds
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--requests", type="int", default=2000,
+                      help="requests for each case [%default]")
+    parser.add_option("--size", type="int", default=20000,
+                      help="size of the static file in bytes [%default]")
+    options, args = parser.parse_args()
+
+    try:
+        directory = os.path.join(STATIC_ROOT, "css")
+        os.makedirs(directory)
+        path = os.path.join(directory, "site.css")
+        f = open(path, "wb")
+        f.write(b"a" * options.size)
+        f.close()
+
+        configure()
+
+        from django.core.wsgi import get_wsgi_application
+        from isotoma.recipe.django.staticserve import StaticFiles
+        django_application = get_wsgi_application()
+        static_application = StaticFiles(django_application)
+
+        etag = static_application.files["css/site.css"].etag
+        cases = [
+            ("GET", {}),
+            ("GET If-None-Match", {"HTTP_IF_NONE_MATCH": etag}),
+            ("GET Range", {"HTTP_RANGE": "bytes=0-1023"}),
+        ]
+        for label, headers in cases:
+            before = measure(
+                "django %s" % label,
+                django_application,
+                "/static/css/site.css",
+                headers,
+                options
+            )
+            after = measure(
+                "wsgi-static %s" % label,
+                static_application,
+                "/static/css/site.css",
+                headers,
+                options
+            )
+            print("%-40s %10.1fx" % ("", before / after))
+    finally:
+        shutil.rmtree(STATIC_ROOT)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+""" Compare rendering templates through the plain filesystem and app
+directories loaders with rendering them through the cached loader that the
+template-cache option configures.
+
+A page template that extends a base template and includes a partial for each
+item in a list is written to a temporary directory, then looked up and
+rendered the way a view does, once per simulated request::
+
+    bin/python benchmarks/template_render.py --renders 2000 --items 20
+"""
+
+from __future__ import print_function
+
+import optparse
+import os
+import shutil
+import tempfile
+import time
+
+TEMPLATES = {
+    "base.html": (
+        "<html><head><title>{% block title %}{% endblock %}</title></head>"
+        "<body>{% block content %}{% endblock %}</body></html>"
+    ),
+    "page.html": (
+        "{% extends 'base.html' %}"
+        "{% block title %}{{ title }}{% endblock %}"
+        "{% block content %}<ul>{% for item in items %}"
+        "{% include 'item.html' %}{% endfor %}</ul>{% endblock %}"
+    ),
+    "item.html": (
+        "<li class=\"{% cycle 'odd' 'even' %}\">"
+        "{{ item.name|title }} ({{ item.count }})</li>"
+    ),
+}
+
+
+def configure(directory):
+    from django.conf import settings
+    settings.configure(
+        # the loaders are listed, as Django 4.1 and later otherwise cache
+        # templates by default when DEBUG is off
+        TEMPLATES=[{
+            "BACKEND": "django.template.backends.django.DjangoTemplates",
+            "DIRS": [directory],
+            "OPTIONS": {
+                "loaders": [
+                    "django.template.loaders.filesystem.Loader",
+                    "django.template.loaders.app_directories.Loader",
+                ],
+            },
+        }],
+        INSTALLED_APPS=[],
+    )
+
+    import django
+    django.setup()
+
+
+def engine(settings):
+    from django.template import Engine
+    backend = settings["TEMPLATES"][0]
+    return Engine(
+        dirs=backend["DIRS"],
+        app_dirs=backend.get("APP_DIRS", False),
+        loaders=backend.get("OPTIONS", {}).get("loaders"),
+    )
+
+
+def measure(label, template_engine, options):
+    from django.template import Context
+    context = {
+        "title": "benchmark",
+        "items": [
+            {"name": "item %d" % i, "count": i}
+            for i in range(options.items)
+        ],
+    }
+
+    template_engine.get_template("page.html").render(Context(context))
+    started = time.time()
+    for i in range(options.renders):
+        template = template_engine.get_template("page.html")
+        template.render(Context(context))
+    seconds = time.time() - started
+    print("%-10s %8.3fms per render" % (
+        label,
+        seconds / options.renders * 1000
+    ))
+    return seconds
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--renders", type="int", default=1000,
+                      help="renders for each configuration [%default]")
+    parser.add_option("--items", type="int", default=20,
+                      help="included partials per render [%default]")
+    options, args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="template-render-")
+    try:
+        for name, source in TEMPLATES.items():
+            output = open(os.path.join(directory, name), "w")
+            output.write(source)
+            output.close()
+
+        configure(directory)
+
+        from django.conf import settings
+        from isotoma.recipe.django.templatecache import cached_loaders
+        uncached = {"TEMPLATES": settings.TEMPLATES}
+        cached = cached_loaders(uncached)
+
+        before = measure("uncached", engine(uncached), options)
+        after = measure("cached", engine(cached), options)
+        print("%-10s %8.1fx" % ("", before / after))
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+""" Compare how long a forked worker takes to load the translations of every
+language with and without the translations wsgi-preload step having loaded
+them in the master first.
+
+Django is configured with its default LANGUAGES and the catalogs it ships.
+For each case a number of workers are forked from the master and each times
+activating every language once, which is what its first request in each
+language would otherwise pay for::
+
+    bin/python benchmarks/translations.py --workers 4
+"""
+
+from __future__ import print_function
+
+import optparse
+import os
+import time
+
+
+def configure():
+    from django.conf import settings
+    settings.configure(
+        USE_I18N=True,
+        LANGUAGE_CODE="en-us",
+        INSTALLED_APPS=[],
+    )
+
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+
+
+def activate_all():
+    from django.conf import settings
+    from django.utils import translation
+
+    started = time.time()
+    for code, name in settings.LANGUAGES:
+        translation.activate(code)
+    translation.deactivate()
+    return time.time() - started
+
+
+def fork_workers(workers):
+    """ The time each forked worker took to activate every language """
+    timings = []
+    for i in range(workers):
+        read_end, write_end = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_end)
+            os.write(write_end, repr(activate_all()).encode("ascii"))
+            os._exit(0)
+        os.close(write_end)
+        output = b""
+        while True:
+            data = os.read(read_end, 1024)
+            if not data:
+                break
+            output += data
+        os.close(read_end)
+        os.waitpid(pid, 0)
+        timings.append(float(output))
+    return timings
+
+
+def report(label, timings):
+    print("%-10s %8.1fms per worker (max %.1fms)" % (
+        label,
+        sum(timings) / len(timings) * 1000,
+        max(timings) * 1000
+    ))
+
+
+def main():
+    parser = optparse.OptionParser(usage="%prog [options]")
+    parser.add_option("--workers", type="int", default=4,
+                      help="workers forked for each case [%default]")
+    options, args = parser.parse_args()
+
+    configure()
+
+    from django.conf import settings
+    print("%d languages" % len(settings.LANGUAGES))
+
+    report("cold", fork_workers(options.workers))
+
+    from isotoma.recipe.django import preload
+    started = time.time()
+    preload.warm_translations(None, None)
+    print("%-10s %8.1fms in the master" % (
+        "preload",
+        (time.time() - started) * 1000
+    ))
+
+    report("preloaded", fork_workers(options.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+""" The ASGI counterpart of instrument.Instrument, for bin/django.asgi.
+
+ASGI servers tell ASGI 3 applications from ASGI 2 ones by whether they are
+coroutine functions, so the middleware's __call__ has to be one. That needs
+python 3, which asgi (Django 3.0 or later) needs anyway; the wsgi scripts,
+which may run on python 2, only import instrument.
+"""
+
+import time
+
+from isotoma.recipe.django.instrument import Recorder
+
+
+class AsgiInstrument(object):
+    """ ASGI middleware recording each HTTP request with a Recorder """
+
+    def __init__(self, application, socket_path, buckets=None, interval=1.0):
+        self.application = application
+        self.recorder = Recorder(socket_path, buckets, interval)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.application(scope, receive, send)
+
+        started = time.time()
+        state = {"status": 500, "sent": 0}
+
+        async def instrumented_send(message):
+            if message["type"] == "http.response.start":
+                state["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                state["sent"] += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    self.recorder.record(
+                        scope["path"],
+                        state["status"],
+                        state["sent"],
+                        time.time() - started
+                    )
+            await send(message)
+
+        return await self.application(scope, receive, instrumented_send)
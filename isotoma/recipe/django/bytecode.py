@@ -0,0 +1,136 @@
+""" Precompile the python files of a project and its working set in parallel.
+
+A manifest of source hashes from the previous run is kept, so files whose
+source has not changed, and whose bytecode is still there and would be
+accepted by the interpreter, are skipped.
+"""
+
+import hashlib
+import multiprocessing
+import os
+import py_compile
+import struct
+import sys
+import time
+
+
+def cache_path(source):
+    """ Where the interpreter looks for the bytecode of source """
+    try:
+        from importlib.util import cache_from_source
+    except ImportError:
+        return source + (__debug__ and "c" or "o")
+    return cache_from_source(source)
+
+
+def magic_number():
+    try:
+        from importlib.util import MAGIC_NUMBER
+    except ImportError:
+        import imp
+        return imp.get_magic()
+    return MAGIC_NUMBER
+
+
+def bytecode_current(path, source):
+    """ Whether the bytecode of path exists and matches source, its contents,
+    by the header the interpreter checks on import: the source's modification
+    time (and size, since python 3.3), or for hash-based bytecode, the hash of
+    the source """
+    try:
+        header = open(cache_path(path), "rb").read(16)
+        stat = os.stat(path)
+    except (IOError, OSError):
+        return False
+    if header[:4] != magic_number():
+        return False
+
+    if sys.version_info >= (3, 7):
+        flags = struct.unpack("<I", header[4:8])[0]
+        if flags & 1:
+            from importlib.util import source_hash
+            return header[8:16] == source_hash(source)
+        stamp = header[8:16]
+    elif sys.version_info >= (3, 3):
+        stamp = header[4:12]
+    else:
+        return header[4:8] == struct.pack(
+            "<I",
+            int(stat.st_mtime) & 0xFFFFFFFF
+        )
+    return stamp == struct.pack(
+        "<II",
+        int(stat.st_mtime) & 0xFFFFFFFF,
+        stat.st_size & 0xFFFFFFFF
+    )
+
+
+def source_files(directory):
+    """ Every python file below directory, skipping hidden directories """
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [
+            dirname for dirname in dirnames
+            if not dirname.startswith(".") and dirname != "__pycache__"
+        ]
+        for filename in filenames:
+            if filename.endswith(".py"):
+                yield os.path.join(dirpath, filename)
+
+
+def compile_file(job):
+    """ Compile a file unless its hash matches the known one and its bytecode
+    is current. Returns (path, hash, status) where status is "compiled",
+    "skipped" or the error message """
+    path, known = job
+    try:
+        source = open(path, "rb").read()
+        digest = hashlib.sha1(source).hexdigest()
+        if digest == known and bytecode_current(path, source):
+            return path, digest, "skipped"
+        py_compile.compile(path, doraise=True)
+    except (py_compile.PyCompileError, IOError, OSError) as e:
+        return path, None, str(e).strip()
+    return path, digest, "compiled"
+
+
+def compile_paths(paths, manifest, workers=None):
+    """ Compile every python file in paths, which may be files or
+    directories. manifest maps paths to the hash of their source when they
+    were last compiled and is updated in place. Returns (compiled, skipped,
+    failures, seconds) where failures is a list of (path, error) """
+    started = time.time()
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(source_files(path))
+        elif path.endswith(".py") and os.path.isfile(path):
+            files.append(path)
+    files = sorted(set(files))
+
+    pool = multiprocessing.Pool(workers or multiprocessing.cpu_count())
+    try:
+        results = pool.imap_unordered(
+            compile_file,
+            [(path, manifest.get(path)) for path in files],
+            64
+        )
+
+        compiled = skipped = 0
+        failures = []
+        for path, digest, status in results:
+            if status == "compiled":
+                compiled += 1
+            elif status == "skipped":
+                skipped += 1
+            else:
+                failures.append((path, status))
+            if digest is None:
+                manifest.pop(path, None)
+            else:
+                manifest[path] = digest
+    finally:
+        pool.close()
+        pool.join()
+
+    return compiled, skipped, failures, time.time() - started
@@ -0,0 +1,104 @@
+""" Compile the gettext catalogs of a project and its working set in
+parallel.
+
+Every .po file in a LC_MESSAGES directory is compiled with msgfmt, as
+Django's compilemessages does, into the .mo file beside it, unless that is
+newer than the .po file. msgfmt runs in a separate process, so a pool of
+threads is enough to keep several running at once.
+"""
+
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+from multiprocessing.pool import ThreadPool
+
+
+def find_msgfmt():
+    for directory in os.environ.get("PATH", "").split(os.pathsep):
+        path = os.path.join(directory, "msgfmt")
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
+
+
+def catalog_files(directory):
+    """ Every .po file in a LC_MESSAGES directory below directory """
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [
+            dirname for dirname in dirnames
+            if not dirname.startswith(".") and dirname != "__pycache__"
+        ]
+        if os.path.basename(dirpath) != "LC_MESSAGES":
+            continue
+        for filename in filenames:
+            if filename.endswith(".po"):
+                yield os.path.join(dirpath, filename)
+
+
+def compile_catalog(job):
+    """ Compile a .po file unless its .mo file is newer. Returns (path,
+    status) where status is "compiled", "skipped" or the error message """
+    msgfmt, path = job
+    target = path[:-3] + ".mo"
+    try:
+        if os.path.exists(target) and \
+                os.path.getmtime(target) >= os.path.getmtime(path):
+            return path, "skipped"
+
+        fd, temp_path = tempfile.mkstemp(
+            prefix=".%s." % os.path.basename(target),
+            dir=os.path.dirname(target)
+        )
+        os.close(fd)
+        try:
+            process = subprocess.Popen(
+                [msgfmt, "--check-format", "-o", temp_path, path],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.STDOUT
+            )
+            output = process.communicate()[0]
+            if process.returncode:
+                os.remove(temp_path)
+                return path, output.decode("utf-8", "replace").strip()
+            os.chmod(temp_path, 0o644)
+            os.rename(temp_path, target)
+        except:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+    except (IOError, OSError) as e:
+        return path, str(e)
+    return path, "compiled"
+
+
+def compile_paths(paths, msgfmt, workers=None):
+    """ Compile the catalogs below each of the directories in paths with the
+    msgfmt executable. Returns (compiled, skipped, failures, seconds) where
+    failures is a list of (path, error) """
+    started = time.time()
+
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(catalog_files(path))
+    files = sorted(set(files))
+
+    pool = ThreadPool(workers or multiprocessing.cpu_count())
+    try:
+        compiled = skipped = 0
+        failures = []
+        for path, status in pool.imap_unordered(
+                compile_catalog, [(msgfmt, path) for path in files]):
+            if status == "compiled":
+                compiled += 1
+            elif status == "skipped":
+                skipped += 1
+            else:
+                failures.append((path, status))
+    finally:
+        pool.close()
+        pool.join()
+
+    return compiled, skipped, failures, time.time() - started
@@ -0,0 +1,222 @@
+""" A warm server for management commands, and the client that replaces the
+control script when the command-server option is on.
+
+The server (bin/django-server) sets Django up once and then listens on a UNIX
+socket. For each connection it forks a child, which runs the command with the
+client's arguments, working directory and environment, streaming its output
+back. The client (bin/django) sends the command to the server, copies the
+output to its own stdout and stderr and exits with the command's exit status.
+If no server is listening it runs the command in-process instead.
+
+The client must stay cheap to start, so this module only imports Django
+inside the functions that need it.
+
+Each message from the server is a frame: a one byte channel ("o" for stdout,
+"e" for stderr, "x" for the exit status), a four byte big-endian length and
+the payload.
+"""
+
+import errno
+import json
+import os
+import signal
+import socket
+import struct
+import sys
+import traceback
+
+from isotoma.recipe.django.commands import native
+
+HEADER = struct.Struct(">cI")
+
+
+def run(argv, index_path=None):
+    """ Run a management command in this process, using the command index if
+    there is one """
+    if index_path is not None:
+        from isotoma.recipe.django.commands import execute_from_command_line
+        execute_from_command_line(index_path, argv)
+    else:
+        from django.core.management import execute_from_command_line
+        execute_from_command_line(argv)
+
+
+def exit_status(exit):
+    """ The status a process would exit with for a SystemExit """
+    if exit.code is None:
+        return 0
+    if isinstance(exit.code, int):
+        return exit.code
+    sys.stderr.write("%s\n" % (exit.code, ))
+    return 1
+
+
+def send_frame(connection, channel, payload):
+    connection.sendall(HEADER.pack(channel, len(payload)) + payload)
+
+
+def receive_exactly(connection, size):
+    data = b""
+    while len(data) < size:
+        chunk = connection.recv(size - len(data))
+        if not chunk:
+            raise EOFError()
+        data += chunk
+    return data
+
+
+class FrameWriter(object):
+    """ A file-like object that sends what is written as frames """
+
+    encoding = "utf-8"
+
+    def __init__(self, connection, channel):
+        self.connection = connection
+        self.channel = channel
+
+    def write(self, data):
+        if not isinstance(data, bytes):
+            data = data.encode(self.encoding)
+        if data:
+            send_frame(self.connection, self.channel, data)
+
+    def writelines(self, lines):
+        for line in lines:
+            self.write(line)
+
+    def flush(self):
+        pass
+
+    def isatty(self):
+        return False
+
+
+def warm_up():
+    """ Do the work every command would otherwise repeat at start up """
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+    else:
+        from django.db.models import get_models
+        get_models()
+
+    from django.core.management import get_commands
+    get_commands()
+
+    # children must not share the server's database connections
+    from django.db import connections
+    for connection in connections.all():
+        connection.close()
+
+
+def handle(connection, index_path=None):
+    """ Run the command requested on connection, in a forked child """
+    request = json.loads(connection.makefile("rb").readline().decode("utf-8"))
+
+    argv = [native(arg) for arg in request["argv"]]
+    os.chdir(native(request["cwd"]))
+    os.environ.clear()
+    for key, value in request["env"].items():
+        os.environ[native(key)] = native(value)
+    sys.argv = argv
+
+    devnull = os.open(os.devnull, os.O_RDONLY)
+    os.dup2(devnull, 0)
+    sys.stdout = FrameWriter(connection, b"o")
+    sys.stderr = FrameWriter(connection, b"e")
+
+    status = 0
+    try:
+        run(argv, index_path)
+    except SystemExit:
+        status = exit_status(sys.exc_info()[1])
+    except Exception:
+        traceback.print_exc()
+        status = 1
+
+    send_frame(connection, b"x", str(status).encode("ascii"))
+    return status
+
+
+def serve(socket_path, index_path=None):
+    """ Warm up, then fork a child to run each command sent to socket_path """
+    warm_up()
+
+    directory = os.path.dirname(socket_path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(socket_path)
+    os.chmod(socket_path, 0o600)
+    server.listen(64)
+
+    # let the kernel reap the children
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+
+    sys.stderr.write("Serving management commands on %s\n" % socket_path)
+    try:
+        while True:
+            try:
+                connection, address = server.accept()
+            except socket.error as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+
+            if os.fork() == 0:
+                server.close()
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                status = 1
+                try:
+                    status = handle(connection, index_path)
+                finally:
+                    os._exit(status)
+            connection.close()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.remove(socket_path)
+
+
+def client(socket_path, argv, index_path=None):
+    """ Run a command on the server, or in-process if none is running """
+    connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        connection.connect(socket_path)
+    except socket.error:
+        connection.close()
+        return run(argv, index_path)
+
+    request = json.dumps({
+        "argv": argv,
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+    })
+    connection.sendall(request.encode("utf-8") + b"\n")
+
+    stdout = getattr(sys.stdout, "buffer", sys.stdout)
+    stderr = getattr(sys.stderr, "buffer", sys.stderr)
+
+    try:
+        while True:
+            channel, length = HEADER.unpack(
+                receive_exactly(connection, HEADER.size)
+            )
+            payload = receive_exactly(connection, length)
+            if channel == b"o":
+                stdout.write(payload)
+                stdout.flush()
+            elif channel == b"e":
+                stderr.write(payload)
+                stderr.flush()
+            elif channel == b"x":
+                sys.exit(int(payload))
+    except EOFError:
+        sys.stderr.write("The command server closed the connection\n")
+        sys.exit(1)
+    finally:
+        connection.close()
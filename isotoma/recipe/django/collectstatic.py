@@ -0,0 +1,167 @@
+""" Collect static files at install time, incrementally and in parallel.
+
+main() is run with the interpreter, eggs and settings of the generated
+scripts, and lists the files Django's staticfiles finders would collect.
+collect() then runs in buildout: a manifest of content hashes from the
+previous run lets unchanged files be skipped, and a pool of processes copies
+the changed ones into the static root and writes their precompressed
+variants, for front end servers that can serve those directly.
+"""
+
+import gzip
+import hashlib
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# formats that are already compressed, and gain nothing from a variant
+COMPRESSED = set([
+    ".gif", ".jpg", ".jpeg", ".png", ".webp", ".ico",
+    ".gz", ".br", ".zip", ".bz2", ".xz",
+    ".woff", ".woff2", ".mp3", ".mp4", ".ogg", ".webm",
+])
+
+IGNORE_PATTERNS = ["CVS", ".*", "*~"]
+
+
+def main():
+    """ Write the static files the finders would collect, as a list of
+    [path in the static root, source path], and STATIC_ROOT to the file named
+    by sys.argv[1] """
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+
+    from django.conf import settings
+    from django.contrib.staticfiles import finders
+
+    found = {}
+    for finder in finders.get_finders():
+        for path, storage in finder.list(IGNORE_PATTERNS):
+            prefix = getattr(storage, "prefix", None)
+            relpath = prefix and os.path.join(prefix, path) or path
+            # the first finder to find a path wins, as with collectstatic
+            if relpath not in found:
+                found[relpath] = storage.path(path)
+
+    output = open(sys.argv[1], "w")
+    json.dump({
+        "files": sorted(found.items()),
+        "static_root": getattr(settings, "STATIC_ROOT", None),
+    }, output)
+    output.close()
+
+
+def write_atomically(path, data):
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # another worker created it first
+            if not os.path.isdir(directory):
+                raise
+
+    fd, temp_path = tempfile.mkstemp(
+        prefix=".%s." % os.path.basename(path),
+        dir=directory
+    )
+    try:
+        temp_file = os.fdopen(fd, "wb")
+        temp_file.write(data)
+        temp_file.close()
+        os.chmod(temp_path, 0o644)
+        os.rename(temp_path, path)
+    except:
+        os.remove(temp_path)
+        raise
+
+
+def gzip_data(data):
+    buf = tempfile.SpooledTemporaryFile()
+    # a fixed mtime keeps the output the same for the same input
+    compressed = gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=9,
+                               mtime=0)
+    compressed.write(data)
+    compressed.close()
+    buf.seek(0)
+    return buf.read()
+
+
+COMPRESSORS = {
+    "gzip": (".gz", gzip_data),
+    "brotli": (".br", brotli and brotli.compress),
+}
+
+
+def collect_file(job):
+    """ Copy a file into the static root, with its compressed variants,
+    unless it is already there. known is the [hash, size, mtime] of the
+    source when it was last collected: the file is skipped without being read
+    if the size and mtime still match, or after hashing it if the content
+    does. Returns (relpath, [hash, size, mtime], copied) """
+    relpath, source, root, known, compress = job
+    target = os.path.join(root, relpath)
+    stat = os.stat(source)
+    exists = os.path.exists(target)
+
+    if known and exists and known[1:] == [stat.st_size, stat.st_mtime]:
+        return relpath, known, False
+
+    data = open(source, "rb").read()
+    record = [hashlib.sha1(data).hexdigest(), stat.st_size, stat.st_mtime]
+
+    if known and exists and known[0] == record[0]:
+        return relpath, record, False
+
+    write_atomically(target, data)
+
+    if os.path.splitext(target)[1].lower() not in COMPRESSED:
+        for name in compress:
+            suffix, compressor = COMPRESSORS[name]
+            compressed = compressor(data)
+            # only keep a variant that is worth serving
+            if len(compressed) < len(data):
+                write_atomically(target + suffix, compressed)
+            elif os.path.exists(target + suffix):
+                os.remove(target + suffix)
+
+    return relpath, record, True
+
+
+def collect(files, root, manifest, compress=(), workers=None):
+    """ Collect files, a list of (path in the static root, source path), into
+    root. manifest maps paths in the static root to the [hash, size, mtime]
+    of their source when they were last collected, and is updated in place.
+    Returns (copied, skipped, bytes processed, seconds) """
+    started = time.time()
+
+    jobs = [
+        (relpath, source, root, manifest.get(relpath), tuple(compress))
+        for relpath, source in files
+    ]
+
+    pool = multiprocessing.Pool(workers or multiprocessing.cpu_count())
+    try:
+        copied = skipped = processed = 0
+        for relpath, record, was_copied in pool.imap_unordered(
+                collect_file, jobs, 16):
+            manifest[relpath] = record
+            if was_copied:
+                copied += 1
+                processed += record[1]
+            else:
+                skipped += 1
+    finally:
+        pool.close()
+        pool.join()
+
+    return copied, skipped, processed, time.time() - started
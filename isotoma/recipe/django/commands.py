@@ -0,0 +1,110 @@
+""" An index of management commands built at install time, so the control
+script does not have to look through the management/commands directory of
+every installed app each time it runs, and the entry point of the scripts
+that run a single command directly.
+
+The recipe builds the index by running main() with the interpreter, eggs and
+settings of the generated scripts. The index records the INSTALLED_APPS it
+was built for, and is ignored if they no longer match the settings, or if the
+command being run is not in it, in which case Django looks the commands up as
+usual.
+"""
+
+import json
+import sys
+
+
+def main():
+    """ Write the command -> app index for the current settings, and the
+    source files of the settings, to the file named by sys.argv[1] """
+    from isotoma.recipe.django.freeze import imported_sources
+
+    before = set(sys.modules)
+    from django.conf import settings
+    installed_apps = list(settings.INSTALLED_APPS)
+    sources = imported_sources(before)
+
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+
+    from django.core.management import get_commands
+
+    output = open(sys.argv[1], "w")
+    json.dump({
+        "installed_apps": installed_apps,
+        "commands": get_commands(),
+        "sources": sources,
+    }, output)
+    output.close()
+
+
+def native(value):
+    """ Turn the unicode that json gives Python 2 back into a str """
+    if not isinstance(value, str):
+        value = value.encode("utf-8")
+    return value
+
+
+def load_index(index_path):
+    """ Return the {command: app} index, or None if it was built for a
+    different set of apps """
+    try:
+        index = json.load(open(index_path))
+    except (IOError, ValueError):
+        return None
+
+    from django.conf import settings
+    if [native(app) for app in index["installed_apps"]] != \
+            list(settings.INSTALLED_APPS):
+        return None
+
+    return dict(
+        (native(command), native(app))
+        for command, app in index["commands"].items()
+    )
+
+
+def use_index(index_path, argv):
+    """ Make Django look commands up in the index, if it is still valid and
+    has the command in argv. Returns True if the index is used """
+    commands = load_index(index_path)
+    if commands is None:
+        return False
+
+    subcommand = len(argv) > 1 and argv[1] or "help"
+    if not subcommand.startswith("-") and \
+            subcommand not in ("help", "version") and \
+            subcommand not in commands:
+        return False
+
+    from django.core import management
+    if hasattr(management, "_commands"):
+        management._commands = commands
+    management.get_commands = lambda: commands
+    return True
+
+
+def execute_from_command_line(index_path, argv):
+    """ Run a management command, looking it up in the index """
+    use_index(index_path, argv)
+
+    from django.core.management import execute_from_command_line
+    execute_from_command_line(argv)
+
+
+def run_command(name, app, argv):
+    """ Run a single management command, importing its class directly rather
+    than going through ManagementUtility. app is the app that provides the
+    command, or None to look it up """
+    import django
+    if hasattr(django, "setup"):
+        django.setup()
+
+    from django.core.management import load_command_class
+    if app is None:
+        from django.core.management import get_commands
+        app = get_commands()[name]
+
+    command = load_command_class(app, name)
+    command.run_from_argv([argv[0], name] + argv[1:])
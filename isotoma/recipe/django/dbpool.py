@@ -0,0 +1,179 @@
+""" A per-process database connection pool, for backends without one of their
+own.
+
+install() is called at the end of the settings module the recipe generates.
+Once a database wrapper is created for one of the pooled aliases, its class
+is patched so that opening a connection takes an idle one from the alias's
+pool, and closing one (at the end of a request, when CONN_MAX_AGE is 0 or has
+passed) rolls it back and returns it to the pool. The pool keeps at most
+size idle connections, closes those idle for longer than idle seconds and,
+with pre_ping, checks a connection with "SELECT 1" before handing it out, so
+one the server has dropped is replaced rather than failing the request.
+Django still runs its own connection set up (autocommit, time zone, ...) on
+every connection it takes from the pool.
+
+Aliases whose OPTIONS configure the backend's own pool, and in-memory SQLite
+databases, are left alone. Connections inherited by a forked worker are
+forgotten, never used or closed, since they are the parent's.
+"""
+
+import logging
+import os
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# {alias: Pool}
+pools = {}
+
+
+def close_quietly(connection):
+    try:
+        connection.close()
+    except Exception:
+        pass
+
+
+def ping(connection):
+    try:
+        cursor = connection.cursor()
+        try:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        finally:
+            cursor.close()
+        # leave no transaction open for Django's autocommit set up
+        connection.rollback()
+    except Exception:
+        return False
+    return True
+
+
+class Pool(object):
+
+    def __init__(self, size=10, idle=300, pre_ping=True):
+        self.size = size
+        self.idle = idle
+        self.pre_ping = pre_ping
+        self.lock = threading.Lock()
+        self.pid = os.getpid()
+        # (connection, time it was returned), most recently returned last
+        self.connections = []
+
+    def check_fork(self):
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.connections = []
+
+    def evict_idle(self, now):
+        """ Remove the connections idle for too long. Call with the lock
+        held, and close the ones returned """
+        expired = []
+        if self.idle:
+            while self.connections and \
+                    now - self.connections[0][1] > self.idle:
+                expired.append(self.connections.pop(0)[0])
+        return expired
+
+    def get(self):
+        """ An idle connection, or None """
+        while True:
+            with self.lock:
+                self.check_fork()
+                expired = self.evict_idle(time.time())
+                connection = self.connections and \
+                    self.connections.pop()[0] or None
+            for old in expired:
+                close_quietly(old)
+
+            if connection is None:
+                return None
+            if not self.pre_ping or ping(connection):
+                return connection
+            close_quietly(connection)
+
+    def put(self, connection):
+        """ Return a connection to the pool, or close it if the pool is
+        full or it is unusable """
+        try:
+            connection.rollback()
+        except Exception:
+            close_quietly(connection)
+            return
+
+        now = time.time()
+        with self.lock:
+            self.check_fork()
+            expired = self.evict_idle(now)
+            if len(self.connections) < self.size:
+                self.connections.append((connection, now))
+                connection = None
+        for old in expired:
+            close_quietly(old)
+        if connection is not None:
+            close_quietly(connection)
+
+
+def patch(cls):
+    """ Make the database wrapper class cls use the pools """
+    if cls.__dict__.get("_pooled"):
+        return
+
+    original_get_new_connection = cls.get_new_connection
+    original_close = cls._close
+
+    def get_new_connection(self, conn_params):
+        pool = pools.get(self.alias)
+        if pool is not None:
+            connection = pool.get()
+            if connection is not None:
+                return connection
+        return original_get_new_connection(self, conn_params)
+
+    def _close(self):
+        pool = pools.get(self.alias)
+        if pool is None or self.connection is None:
+            return original_close(self)
+        pool.put(self.connection)
+
+    cls.get_new_connection = get_new_connection
+    cls._close = _close
+    cls._pooled = True
+
+
+def poolable(config):
+    if "pool" in (config.get("OPTIONS") or {}):
+        # the backend's own pool is configured
+        return False
+    if config.get("ENGINE", "").endswith("sqlite3"):
+        name = str(config.get("NAME") or "")
+        if not name or name == ":memory:" or "mode=memory" in name:
+            return False
+    return True
+
+
+def install(databases, size=10, idle=300, pre_ping=True):
+    """ Pool the connections of the aliases in databases (the DATABASES
+    setting) that can be pooled """
+    import django
+    if django.VERSION < (1, 8):
+        log.warning("Connection pooling needs Django 1.8 or later")
+        return
+
+    for alias, config in databases.items():
+        if poolable(config):
+            pools[alias] = Pool(size, idle, pre_ping)
+
+    from django.db.backends.base.base import BaseDatabaseWrapper
+    if BaseDatabaseWrapper.__dict__.get("_pool_init"):
+        return
+    original_init = BaseDatabaseWrapper.__init__
+
+    def __init__(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        if self.alias in pools:
+            patch(type(self))
+
+    BaseDatabaseWrapper.__init__ = __init__
+    BaseDatabaseWrapper._pool_init = True
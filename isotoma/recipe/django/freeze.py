@@ -0,0 +1,136 @@
+""" Evaluate a settings module and write it out as a single flat module of
+literal values, so that starting a process no longer runs the settings import
+chain.
+
+This is run by the recipe at install time, in a separate process with the
+interpreter, sys.path and environment of the generated scripts:
+
+    python -c "...; from isotoma.recipe.django.freeze import main; main(name)" OUTPUT
+
+The result is written to OUTPUT as JSON: the source of the frozen module, the
+names of any settings that cannot be written as literals or did not evaluate
+back to their live values, and the source files the settings were read from.
+The recipe only uses the frozen module when both lists of names are empty.
+"""
+
+import json
+import math
+import os
+import sys
+import sysconfig
+
+try:
+    from importlib import import_module
+except ImportError:
+    def import_module(name):
+        __import__(name)
+        return sys.modules[name]
+
+LITERAL_TYPES = (type(None), bool, int, float, str, bytes)
+try:
+    LITERAL_TYPES += (long, unicode)
+except NameError:
+    pass
+
+HEADER = """\
+# Frozen settings generated by isotoma.recipe.django from %s.
+# Do not edit: this file is rewritten each time buildout runs.
+
+"""
+
+
+def is_literal(value):
+    """ Whether value is made only of types whose repr is a python literal """
+    kind = type(value)
+    if kind is float:
+        return not (math.isinf(value) or math.isnan(value))
+    if kind in LITERAL_TYPES:
+        return True
+    if kind in (list, tuple):
+        return all(is_literal(item) for item in value)
+    if kind is dict:
+        return all(
+            is_literal(key) and is_literal(item)
+            for key, item in value.items()
+        )
+    return False
+
+
+def same(a, b):
+    """ Equal, and of the same types all the way down """
+    if type(a) is not type(b):
+        return False
+    if type(a) in (list, tuple):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if type(a) is dict:
+        return sorted(a.keys()) == sorted(b.keys()) and \
+            all(same(a[key], b[key]) for key in a)
+    return a == b
+
+
+def settings_values(module):
+    """ The settings defined by a module, using Django's rule that settings
+    are the upper case names """
+    return dict(
+        (name, getattr(module, name)) for name in dir(module)
+        if name.isupper()
+    )
+
+
+def imported_sources(before):
+    """ The source files of the modules imported since before, the names in
+    sys.modules at the time, leaving out the standard library. The recipe
+    keeps them in its fingerprint, since what it builds from the settings
+    goes stale when they change """
+    stdlib = os.path.realpath(sysconfig.get_paths()["stdlib"])
+    stdlib = os.path.join(stdlib, "")
+    sources = set()
+    for name, module in list(sys.modules.items()):
+        filename = getattr(module, "__file__", None)
+        if name in before or not filename:
+            continue
+        if filename.endswith((".pyc", ".pyo")):
+            filename = filename[:-1]
+        filename = os.path.realpath(filename)
+        if filename.endswith(".py") and not filename.startswith(stdlib):
+            sources.add(filename)
+    return sorted(sources)
+
+
+def freeze(module_name):
+    """ Return (source, unrepresentable, mismatched) for the module """
+    values = settings_values(import_module(module_name))
+
+    unrepresentable = sorted(
+        name for name, value in values.items() if not is_literal(value)
+    )
+
+    lines = [HEADER % module_name]
+    for name in sorted(values):
+        if name not in unrepresentable:
+            lines.append("%s = %r\n" % (name, values[name]))
+    source = "".join(lines)
+
+    # check the frozen module against the live values
+    frozen = {}
+    exec(compile(source, "<frozen settings>", "exec"), frozen)
+    mismatched = sorted(
+        name for name in values
+        if name not in unrepresentable and
+        not (name in frozen and same(frozen[name], values[name]))
+    )
+
+    return source, unrepresentable, mismatched
+
+
+def main(module_name):
+    before = set(sys.modules)
+    source, unrepresentable, mismatched = freeze(module_name)
+    output = open(sys.argv[1], "w")
+    json.dump({
+        "source": source,
+        "unrepresentable": unrepresentable,
+        "mismatched": mismatched,
+        "sources": imported_sources(before),
+    }, output)
+    output.close()
@@ -0,0 +1,257 @@
+""" Per-request latency and throughput instrumentation for the generated wsgi
+and asgi applications (the asgi middleware is in asgiinstrument).
+
+Each worker keeps a latency histogram, a request count and the bytes sent for
+every (URL name, status) pair, and at most once per interval sends what it has
+collected since the last send as a JSON datagram to a UNIX socket, from the
+request that completes the interval. The socket is non-blocking and send
+errors are ignored, so a missing or slow collector loses data rather than
+holding up requests. collect() is a collector that prints each datagram as a
+line of JSON, for piping into whatever keeps the metrics.
+
+A datagram looks like::
+
+    {"pid": 1234, "seconds": 1.02, "buckets": [5, 10, ...],
+     "metrics": [{"url": "blog:post", "status": 200, "count": 31,
+                  "bytes": 201412, "seconds": 0.913,
+                  "histogram": [4, 20, 7, 0, ...]}, ...]}
+
+where the last histogram entry counts requests slower than the last bucket,
+in milliseconds.
+"""
+
+import errno
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+# upper bounds of the latency buckets, in milliseconds
+BUCKETS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+
+# metrics for this many keys go in each datagram, to stay well under the
+# socket's maximum datagram size
+KEYS_PER_DATAGRAM = 50
+
+# URL names are cached by path, and the cache is cleared when it gets this big
+URL_CACHE_SIZE = 10000
+
+UNRESOLVED = "<unresolved>"
+
+
+def url_name(path):
+    """ The name of the URL pattern path resolves to, the dotted path of its
+    view if the pattern has no name, or "<unresolved>" """
+    try:
+        from django.urls import resolve, Resolver404
+    except ImportError:
+        from django.core.urlresolvers import resolve, Resolver404
+
+    try:
+        match = resolve(path)
+    except Resolver404:
+        return UNRESOLVED
+
+    if match.url_name:
+        return match.view_name
+    func = match.func
+    return "%s.%s" % (
+        func.__module__,
+        getattr(func, "__name__", func.__class__.__name__)
+    )
+
+
+class Recorder(object):
+    """ Collects the metrics of a worker and sends them to socket_path """
+
+    def __init__(self, socket_path, buckets=None, interval=1.0):
+        self.socket_path = socket_path
+        self.buckets = list(buckets or BUCKETS)
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.urls = {}
+        self.reset()
+
+    def reset(self):
+        # a worker forked after requests were recorded (by a preload step in
+        # the master, say) must not send them again
+        self.pid = os.getpid()
+        self.metrics = {}
+        self.started = time.time()
+        self.sock = None
+
+    def resolve(self, path):
+        name = self.urls.get(path)
+        if name is None:
+            try:
+                name = url_name(path)
+            except Exception:
+                name = UNRESOLVED
+            if len(self.urls) >= URL_CACHE_SIZE:
+                self.urls.clear()
+            self.urls[path] = name
+        return name
+
+    def record(self, path, status, sent, seconds):
+        key = (self.resolve(path), status)
+        milliseconds = seconds * 1000
+
+        bucket = 0
+        for bound in self.buckets:
+            if milliseconds <= bound:
+                break
+            bucket += 1
+
+        with self.lock:
+            if self.pid != os.getpid():
+                self.reset()
+            metric = self.metrics.get(key)
+            if metric is None:
+                metric = self.metrics[key] = [
+                    0, 0, 0.0, [0] * (len(self.buckets) + 1)
+                ]
+            metric[0] += 1
+            metric[1] += sent
+            metric[2] += seconds
+            metric[3][bucket] += 1
+
+            now = time.time()
+            if now - self.started < self.interval:
+                return
+            metrics, elapsed = self.metrics, now - self.started
+            self.metrics = {}
+            self.started = now
+
+        self.send(metrics, elapsed)
+
+    def send(self, metrics, elapsed):
+        if self.sock is None:
+            self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.sock.setblocking(False)
+
+        items = sorted(metrics.items())
+        for start in range(0, len(items), KEYS_PER_DATAGRAM):
+            datagram = json.dumps({
+                "pid": self.pid,
+                "seconds": round(elapsed, 3),
+                "buckets": self.buckets,
+                "metrics": [
+                    {
+                        "url": url,
+                        "status": status,
+                        "count": count,
+                        "bytes": sent,
+                        "seconds": round(seconds, 6),
+                        "histogram": histogram,
+                    }
+                    for (url, status), (count, sent, seconds, histogram)
+                    in items[start:start + KEYS_PER_DATAGRAM]
+                ],
+            }, separators=(",", ":"))
+            try:
+                self.sock.sendto(datagram.encode("utf-8"), self.socket_path)
+            except socket.error as e:
+                if e.args[0] not in (errno.ENOENT, errno.ECONNREFUSED,
+                                     errno.EAGAIN, errno.EWOULDBLOCK,
+                                     errno.ENOBUFS, errno.EMSGSIZE):
+                    raise
+                # nobody is listening, or they are not keeping up
+                return
+
+
+class ResponseIterator(object):
+    """ Counts the bytes of a wsgi response, and records the request when the
+    server closes it """
+
+    def __init__(self, response, done):
+        self.response = response
+        self.done = done
+        self.sent = 0
+        self.closed = False
+
+    def __iter__(self):
+        for data in self.response:
+            self.sent += len(data)
+            yield data
+
+    def close(self):
+        try:
+            if hasattr(self.response, "close"):
+                self.response.close()
+        finally:
+            if not self.closed:
+                self.closed = True
+                self.done(self.sent)
+
+
+class Instrument(object):
+    """ WSGI middleware recording each request with a Recorder """
+
+    def __init__(self, application, socket_path, buckets=None, interval=1.0):
+        self.application = application
+        self.recorder = Recorder(socket_path, buckets, interval)
+
+    def __call__(self, environ, start_response):
+        started = time.time()
+        status = []
+        length = []
+
+        def instrumented_start_response(response_status, headers,
+                                        exc_info=None):
+            status[:] = [int(response_status.split(" ", 1)[0])]
+            length[:] = [
+                value for name, value in headers
+                if name.lower() == "content-length"
+            ]
+            return start_response(response_status, headers, exc_info)
+
+        def done(sent):
+            self.recorder.record(
+                environ.get("PATH_INFO", "/"),
+                status and status[0] or 500,
+                sent,
+                time.time() - started
+            )
+
+        try:
+            response = self.application(environ, instrumented_start_response)
+        except Exception:
+            done(0)
+            raise
+
+        # wrapping a file wrapper would stop the server sending it with
+        # sendfile, so record it as it is handed over. Most servers' wrappers
+        # keep the file as filelike; uWSGI's is a function returning the file
+        if environ.get("wsgi.file_wrapper") is not None and (
+                hasattr(response, "filelike") or
+                hasattr(response, "fileno")):
+            done(length and int(length[0]) or 0)
+            return response
+
+        return ResponseIterator(response, done)
+
+
+def collect(socket_path):
+    """ Receive datagrams on socket_path and write them to stdout, one per
+    line """
+    directory = os.path.dirname(socket_path)
+    if directory and not os.path.isdir(directory):
+        os.makedirs(directory)
+    if os.path.exists(socket_path):
+        os.remove(socket_path)
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    sock.bind(socket_path)
+    sys.stderr.write("Collecting metrics on %s\n" % socket_path)
+    try:
+        while True:
+            datagram = sock.recv(65536 * 4)
+            sys.stdout.write(datagram.decode("utf-8") + "\n")
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sock.close()
+        os.remove(socket_path)
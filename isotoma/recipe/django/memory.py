@@ -0,0 +1,37 @@
+""" Keep the heap of a preloading master shareable with the workers it forks.
+
+Once the wsgi application has been imported (and preloaded), collecting and
+freezing the heap moves every object into the permanent generation, so the
+cyclic garbage collector in the workers never walks them and does not dirty
+the copy-on-write pages they live in.
+"""
+
+import gc
+import logging
+import sys
+import time
+
+log = logging.getLogger(__name__)
+
+
+def freeze_heap(thresholds=None):
+    """ Collect and freeze the heap, then optionally set the collector
+    thresholds for the rest of the process's life """
+    started = time.time()
+    gc.collect()
+
+    if hasattr(gc, "freeze"):
+        gc.freeze()
+        log.info("Froze %d objects in %.1fms" % (
+            gc.get_freeze_count(),
+            (time.time() - started) * 1000
+        ))
+    else:
+        log.warning(
+            "gc.freeze() is not available in Python %s, the heap was "
+            "collected but not frozen" % sys.version.split()[0]
+        )
+
+    if thresholds:
+        gc.set_threshold(*thresholds)
+        log.info("Set gc thresholds to %r" % (tuple(thresholds), ))
@@ -0,0 +1,344 @@
+""" A Django cache backend in a memory-mapped file, shared by every worker on
+the host.
+
+The file is a fixed-size, set-associative hash table: a key hashes to one set
+of WAYS slots, each SLOT_SIZE bytes holding the key, the pickled value and its
+expiry time. When a set is full the slot to replace is chosen by CLOCK: each
+slot has a reference bit, set when the slot is read, and the set's hand moves
+over the slots clearing the bits until it finds one that is clear. Values
+that do not fit in a slot are not cached.
+
+Each operation locks only the set it touches, with an fcntl byte-range lock
+on the set's region of the file (shared for reads, exclusive for writes) for
+the other processes, and a lock shared by the threads of this process, since
+fcntl locks do not exclude threads of the same process.
+
+    CACHES = {
+        "default": {
+            "BACKEND": "isotoma.recipe.django.mmapcache.MmapCache",
+            "LOCATION": "/var/cache/example/cache.mmap",
+            "OPTIONS": {"SIZE": 64 * 1024 * 1024, "SLOT_SIZE": 4096,
+                        "WAYS": 8},
+        },
+    }
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import zlib
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from django.core.cache.backends.base import BaseCache
+
+try:
+    from django.core.cache.backends.base import DEFAULT_TIMEOUT
+except ImportError:
+    DEFAULT_TIMEOUT = object()
+
+MAGIC = b"DJMMAP01"
+# magic, number of sets, ways, slot size
+FILE_HEADER = struct.Struct("<8sIII")
+# the file header is padded to a page, so the sets start page aligned
+HEADER_SIZE = mmap.PAGESIZE
+# the CLOCK hand of a set
+SET_HEADER = struct.Struct("<I")
+# key crc32, expiry time (0 for never), flags, key length, value length
+SLOT_HEADER = struct.Struct("<IdBHI")
+
+USED = 1
+REFERENCED = 2
+
+# the threads of a process share one lock for each of this many stripes of
+# sets
+THREAD_LOCKS = 64
+
+# {path: (mmap, fd, thread locks, sets, ways, slot size)} for the files this
+# process has open, shared by all the cache instances using them
+mapped = {}
+mapped_lock = threading.Lock()
+
+
+def create_file(path, header, total):
+    """ Create an empty cache file of total bytes starting with header at
+    path. It is written to a temporary file and renamed into place, so
+    processes still mapping a file it replaces keep their copy, rather than
+    having it truncated under them, which would kill them with SIGBUS """
+    fd, temp_path = tempfile.mkstemp(
+        prefix=".%s." % os.path.basename(path),
+        dir=os.path.dirname(path) or "."
+    )
+    try:
+        os.ftruncate(fd, total)
+        os.write(fd, header)
+        os.close(fd)
+        os.rename(temp_path, path)
+    except OSError:
+        os.close(fd)
+        os.remove(temp_path)
+        raise
+
+
+def open_map(path, size, ways, slot_size):
+    """ Map the cache file at path, creating or replacing it if its layout is
+    not the one asked for """
+    set_size = SET_HEADER.size + ways * slot_size
+    sets = max((size - HEADER_SIZE) // set_size, 1)
+    total = HEADER_SIZE + sets * set_size
+    expected = FILE_HEADER.pack(MAGIC, sets, ways, slot_size)
+
+    directory = os.path.dirname(path)
+    if directory and not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            if not os.path.isdir(directory):
+                raise
+
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.lockf(fd, fcntl.LOCK_EX, HEADER_SIZE, 0)
+        try:
+            stat = os.fstat(fd)
+            try:
+                current = os.stat(path)
+            except OSError:
+                current = None
+            if current is None or current.st_ino != stat.st_ino or \
+                    current.st_dev != stat.st_dev:
+                # another process replaced the file while this one waited
+                # for the lock, so open the new one
+                pass
+            elif os.read(fd, FILE_HEADER.size) == expected and \
+                    stat.st_size == total:
+                break
+            else:
+                # a new file, or one laid out for other options
+                create_file(path, expected, total)
+        finally:
+            fcntl.lockf(fd, fcntl.LOCK_UN, HEADER_SIZE, 0)
+        os.close(fd)
+
+    data = mmap.mmap(fd, total, mmap.MAP_SHARED,
+                     mmap.PROT_READ | mmap.PROT_WRITE)
+    locks = [threading.Lock() for i in range(min(sets, THREAD_LOCKS))]
+    return data, fd, locks, sets, ways, slot_size
+
+
+class MmapCache(BaseCache):
+
+    def __init__(self, location, params):
+        super(MmapCache, self).__init__(params)
+        options = params.get("OPTIONS", {})
+        self.path = location
+        size = int(options.get("SIZE", 64 * 1024 * 1024))
+        ways = int(options.get("WAYS", 8))
+        slot_size = int(options.get("SLOT_SIZE", 4096))
+
+        with mapped_lock:
+            if location not in mapped:
+                mapped[location] = open_map(location, size, ways, slot_size)
+            self.data, self.fd, self.locks, self.sets, self.ways, \
+                self.slot_size = mapped[location]
+
+        self.set_size = SET_HEADER.size + self.ways * self.slot_size
+        self.payload_size = self.slot_size - SLOT_HEADER.size
+
+    def expiry(self, timeout):
+        """ The absolute expiry time for a timeout, 0 for never """
+        if hasattr(self, "get_backend_timeout"):
+            expires = self.get_backend_timeout(timeout)
+            return 0 if expires is None else expires
+        if timeout is None or timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        return time.time() + timeout
+
+    def encode_key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        if not isinstance(key, bytes):
+            key = key.encode("utf-8")
+        return key, zlib.crc32(key) & 0xffffffff
+
+    def lock(self, set_index, exclusive):
+        thread_lock = self.locks[set_index % len(self.locks)]
+        thread_lock.acquire()
+        try:
+            fcntl.lockf(
+                self.fd,
+                exclusive and fcntl.LOCK_EX or fcntl.LOCK_SH,
+                self.set_size,
+                HEADER_SIZE + set_index * self.set_size
+            )
+        except:
+            thread_lock.release()
+            raise
+
+    def unlock(self, set_index):
+        try:
+            fcntl.lockf(
+                self.fd,
+                fcntl.LOCK_UN,
+                self.set_size,
+                HEADER_SIZE + set_index * self.set_size
+            )
+        finally:
+            self.locks[set_index % len(self.locks)].release()
+
+    def find(self, set_offset, key, crc):
+        """ The offset of the slot holding key in the set at set_offset, with
+        its header, or (None, None) """
+        data = self.data
+        slot = set_offset + SET_HEADER.size
+        for way in range(self.ways):
+            header = SLOT_HEADER.unpack_from(data, slot)
+            if header[2] & USED and header[0] == crc and \
+                    header[3] == len(key):
+                start = slot + SLOT_HEADER.size
+                if data[start:start + len(key)] == key:
+                    return slot, header
+            slot += self.slot_size
+        return None, None
+
+    def victim(self, set_offset):
+        """ The offset of the slot to write a new key to in the set at
+        set_offset: a free or expired one, or else the one CLOCK picks """
+        data = self.data
+        now = time.time()
+        first = set_offset + SET_HEADER.size
+        for way in range(self.ways):
+            slot = first + way * self.slot_size
+            crc, expires, flags, key_length, value_length = \
+                SLOT_HEADER.unpack_from(data, slot)
+            if not flags & USED or (expires and expires <= now):
+                return slot
+
+        hand = SET_HEADER.unpack_from(data, set_offset)[0] % self.ways
+        while True:
+            slot = first + hand * self.slot_size
+            hand = (hand + 1) % self.ways
+            flags = ord(data[slot + 12:slot + 13])
+            if flags & REFERENCED:
+                data[slot + 12:slot + 13] = struct.pack(
+                    "B", flags & ~REFERENCED
+                )
+                continue
+            SET_HEADER.pack_into(data, set_offset, hand)
+            return slot
+
+    def write_slot(self, slot, key, crc, value, expires):
+        data = self.data
+        start = slot + SLOT_HEADER.size
+        data[start:start + len(key)] = key
+        data[start + len(key):start + len(key) + len(value)] = value
+        SLOT_HEADER.pack_into(
+            data, slot, crc, expires, USED | REFERENCED, len(key), len(value)
+        )
+
+    def store(self, key, value, timeout, version, only_new):
+        key, crc = self.encode_key(key, version)
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        fits = len(key) + len(value) <= self.payload_size
+        set_index = crc % self.sets
+        set_offset = HEADER_SIZE + set_index * self.set_size
+
+        self.lock(set_index, True)
+        try:
+            slot, header = self.find(set_offset, key, crc)
+            if slot is not None:
+                live = not header[1] or header[1] > time.time()
+                if only_new and live:
+                    return False
+                if not fits:
+                    # the old value must not outlive the new one
+                    SLOT_HEADER.pack_into(self.data, slot, 0, 0, 0, 0, 0)
+                    return False
+            elif not fits:
+                return False
+            else:
+                slot = self.victim(set_offset)
+            self.write_slot(slot, key, crc, value, self.expiry(timeout))
+            return True
+        finally:
+            self.unlock(set_index)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.store(key, value, timeout, version, True)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.store(key, value, timeout, version, False)
+
+    def get(self, key, default=None, version=None):
+        key, crc = self.encode_key(key, version)
+        set_index = crc % self.sets
+        set_offset = HEADER_SIZE + set_index * self.set_size
+
+        self.lock(set_index, False)
+        try:
+            slot, header = self.find(set_offset, key, crc)
+            if slot is None or (header[1] and header[1] <= time.time()):
+                return default
+            # setting the bit races only with other readers setting it
+            self.data[slot + 12:slot + 13] = struct.pack(
+                "B", header[2] | REFERENCED
+            )
+            start = slot + SLOT_HEADER.size + header[3]
+            value = self.data[start:start + header[4]]
+        finally:
+            self.unlock(set_index)
+
+        return pickle.loads(value)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key, crc = self.encode_key(key, version)
+        set_index = crc % self.sets
+        set_offset = HEADER_SIZE + set_index * self.set_size
+
+        self.lock(set_index, True)
+        try:
+            slot, header = self.find(set_offset, key, crc)
+            if slot is None or (header[1] and header[1] <= time.time()):
+                return False
+            SLOT_HEADER.pack_into(
+                self.data, slot, header[0], self.expiry(timeout), header[2],
+                header[3], header[4]
+            )
+            return True
+        finally:
+            self.unlock(set_index)
+
+    def delete(self, key, version=None):
+        key, crc = self.encode_key(key, version)
+        set_index = crc % self.sets
+        set_offset = HEADER_SIZE + set_index * self.set_size
+
+        self.lock(set_index, True)
+        try:
+            slot, header = self.find(set_offset, key, crc)
+            if slot is None:
+                return False
+            SLOT_HEADER.pack_into(self.data, slot, 0, 0, 0, 0, 0)
+            return not header[1] or header[1] > time.time()
+        finally:
+            self.unlock(set_index)
+
+    def has_key(self, key, version=None):
+        return self.get(key, self, version=version) is not self
+
+    def clear(self):
+        for set_index in range(self.sets):
+            set_offset = HEADER_SIZE + set_index * self.set_size
+            self.lock(set_index, True)
+            try:
+                self.data[set_offset:set_offset + self.set_size] = \
+                    b"\0" * self.set_size
+            finally:
+                self.unlock(set_index)
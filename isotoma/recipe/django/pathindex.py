@@ -0,0 +1,86 @@
+""" A meta path finder that imports top level modules from the directories
+listed for them in an index, instead of searching every egg on sys.path.
+
+The recipe copies this module, along with the index it built at install time,
+into the part directory when path-mode is "index". The index is read from the
+JSON file next to the module, and maps each top level module name to the
+directories that provide it, in working set order.
+"""
+
+import json
+import os
+import sys
+
+
+class IndexFinder(object):
+
+    def __init__(self, index):
+        self.index = index
+
+    def extend_path(self, module):
+        """ Add the portions of a package found in the other directories
+        that provide it, for namespace packages """
+        path = getattr(module, "__path__", None)
+        if path is None:
+            return
+        for location in self.index[module.__name__]:
+            portion = os.path.join(location, module.__name__)
+            if os.path.isdir(portion) and portion not in path:
+                path.append(portion)
+
+    # Python 3.4+
+
+    def find_spec(self, fullname, path, target=None):
+        if path is not None or fullname not in self.index:
+            return None
+        from importlib.machinery import PathFinder
+        spec = PathFinder.find_spec(fullname, self.index[fullname], target)
+        if spec is not None and spec.submodule_search_locations is not None:
+            for location in self.index[fullname]:
+                portion = os.path.join(location, fullname)
+                if os.path.isdir(portion) and \
+                        portion not in spec.submodule_search_locations:
+                    spec.submodule_search_locations.append(portion)
+        return spec
+
+    # Python 2
+
+    def find_module(self, fullname, path=None):
+        if path is not None or fullname not in self.index:
+            return None
+        return self
+
+    def load_module(self, fullname):
+        import imp
+
+        if fullname in sys.modules:
+            return sys.modules[fullname]
+
+        found, pathname, description = imp.find_module(
+            fullname,
+            self.index[fullname]
+        )
+        try:
+            module = imp.load_module(fullname, found, pathname, description)
+        finally:
+            if found is not None:
+                found.close()
+
+        self.extend_path(module)
+        return module
+
+
+def install(index_path=None):
+    """ Put a finder for the index in front of sys.meta_path. Relative
+    directories in the index are relative to the index file """
+    if index_path is None:
+        index_path = os.path.splitext(os.path.abspath(__file__))[0] + ".json"
+    directory = os.path.dirname(os.path.abspath(index_path))
+    index = dict(
+        (name, [os.path.normpath(os.path.join(directory, location))
+                for location in locations])
+        for name, locations in json.load(open(index_path)).items()
+    )
+    finder = IndexFinder(index)
+    sys.meta_path.insert(0, finder)
+    return finder
@@ -0,0 +1,230 @@
+""" Collapse the directories of a working set into a single sys.path entry,
+either as a farm of symlinks or as an index of where each top level module
+lives (see pathindex.py for the finder that reads the index).
+
+Distributions are processed in working set order and the first one to
+provide a module wins, just as it would when every egg is on sys.path.
+Namespace packages, and directories without an __init__ module, are merged
+from every distribution that provides part of them.
+"""
+
+import os
+import shutil
+
+
+def module_suffixes():
+    """ The file suffixes of importable modules, longest first """
+    try:
+        from importlib.machinery import all_suffixes
+        suffixes = all_suffixes()
+    except ImportError:
+        import imp
+        suffixes = [suffix for suffix, mode, kind in imp.get_suffixes()]
+    return sorted(set(suffixes), key=len, reverse=True)
+
+
+def top_level_names(dist):
+    """ The names of the top level modules and packages of a distribution """
+    if dist.has_metadata("top_level.txt"):
+        return [
+            name.strip() for name in dist.get_metadata_lines("top_level.txt")
+            if name.strip() and "/" not in name
+        ]
+
+    names = []
+    suffixes = module_suffixes()
+    for entry in sorted(os.listdir(dist.location)):
+        path = os.path.join(dist.location, entry)
+        if os.path.isdir(path):
+            if os.path.exists(os.path.join(path, "__init__.py")):
+                names.append(entry)
+            continue
+        for suffix in suffixes:
+            if entry.endswith(suffix):
+                names.append(entry[:-len(suffix)])
+                break
+
+    return sorted(set(names))
+
+
+def namespace_packages(dist):
+    if dist.has_metadata("namespace_packages.txt"):
+        return set(
+            name.strip()
+            for name in dist.get_metadata_lines("namespace_packages.txt")
+        )
+    return set()
+
+
+def module_files(directory, name, suffixes):
+    """ The files that make up the module name in directory """
+    return [
+        name + suffix for suffix in suffixes
+        if os.path.isfile(os.path.join(directory, name + suffix))
+    ]
+
+
+def egg_info_path(dist):
+    """ The metadata directory of an unpacked or develop distribution """
+    provider = getattr(dist, "_provider", None)
+    egg_info = getattr(provider, "egg_info", None)
+    if egg_info and os.path.isdir(egg_info):
+        return egg_info
+    return None
+
+
+def _claimed(links, relpath):
+    """ Whether relpath, or a directory above it, is already a link """
+    while relpath:
+        if relpath in links:
+            return True
+        relpath = os.path.dirname(relpath)
+    return False
+
+
+def _has_children(links, relpath):
+    prefix = relpath + os.sep
+    for path in links:
+        if path.startswith(prefix):
+            return True
+    return False
+
+
+def _add_links(links, location, dotted, namespaces, suffixes):
+    relpath = dotted.replace(".", os.sep)
+    source = os.path.join(location, relpath)
+    directory, name = os.path.split(relpath)
+
+    if not os.path.isdir(source):
+        for filename in module_files(os.path.dirname(source), name, suffixes):
+            path = os.path.join(directory, filename)
+            if not _claimed(links, path):
+                links[path] = os.path.join(location, path)
+        return
+
+    if _claimed(links, relpath):
+        return
+
+    merge = (
+        dotted in namespaces or
+        not module_files(source, "__init__", suffixes) or
+        _has_children(links, relpath)
+    )
+    if not merge:
+        links[relpath] = source
+        return
+
+    for entry in sorted(os.listdir(source)):
+        if os.path.isdir(os.path.join(source, entry)):
+            _add_links(links, location, dotted + "." + entry, namespaces,
+                       suffixes)
+        else:
+            path = os.path.join(relpath, entry)
+            if not _claimed(links, path):
+                links[path] = os.path.join(source, entry)
+
+
+def farm_links(dists):
+    """ Return a {path in the farm: target} mapping of the links needed to
+    make every module of the distributions importable from one directory """
+    links = {}
+    suffixes = module_suffixes()
+
+    for dist in dists:
+        namespaces = namespace_packages(dist)
+        for name in top_level_names(dist):
+            _add_links(links, dist.location, name, namespaces, suffixes)
+
+        # keep the distribution visible to pkg_resources
+        egg_info = egg_info_path(dist)
+        if egg_info:
+            links.setdefault(dist.egg_name() + ".egg-info", egg_info)
+
+    return links
+
+
+def relative_to(path, start, root):
+    """ path relative to start if it lies within root, otherwise path """
+    relative = os.path.relpath(path, root)
+    if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+        return path
+    return os.path.relpath(path, start)
+
+
+def relative_links(directory, links, root):
+    """ The links of a farm in directory with the targets within root made
+    relative to the links, so the farm can be moved along with root """
+    return dict(
+        (path, relative_to(
+            target,
+            os.path.dirname(os.path.join(directory, path)),
+            root
+        ))
+        for path, target in links.items()
+    )
+
+
+def existing_links(directory):
+    links = {}
+    for dirpath, dirnames, filenames in os.walk(directory):
+        for name in dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            if os.path.islink(path):
+                links[os.path.relpath(path, directory)] = os.readlink(path)
+    return links
+
+
+def build_farm(directory, links):
+    """ Make directory hold exactly the links given, building the new farm
+    beside it and swapping it into place. Returns True if it changed """
+    if os.path.isdir(directory) and existing_links(directory) == links:
+        return False
+
+    staging = directory + ".new"
+    if os.path.exists(staging):
+        shutil.rmtree(staging)
+    os.mkdir(staging)
+
+    for path, target in sorted(links.items()):
+        link = os.path.join(staging, path)
+        if not os.path.isdir(os.path.dirname(link)):
+            os.makedirs(os.path.dirname(link))
+        os.symlink(target, link)
+
+    if os.path.exists(directory):
+        old = directory + ".old"
+        os.rename(directory, old)
+        os.rename(staging, directory)
+        shutil.rmtree(old)
+    else:
+        os.rename(staging, directory)
+
+    return True
+
+
+def path_index(dists):
+    """ Return a {top level module name: [directories]} index of where each
+    module of the distributions can be found, in working set order """
+    index = {}
+    suffixes = module_suffixes()
+
+    for dist in dists:
+        for name in top_level_names(dist):
+            if not os.path.isdir(os.path.join(dist.location, name)) and \
+                    not module_files(dist.location, name, suffixes):
+                continue
+            locations = index.setdefault(name, [])
+            if dist.location not in locations:
+                locations.append(dist.location)
+
+    return index
+
+
+def relative_index(directory, index, root):
+    """ The index with the directories within root made relative to the
+    directory it is kept in, which the finder resolves them against """
+    return dict(
+        (name, [relative_to(location, directory, root)
+                for location in locations])
+        for name, locations in index.items()
+    )
@@ -0,0 +1,161 @@
+""" Warm up a Django application when the wsgi script is imported, so that the
+first requests a fresh worker serves do not pay for Django's lazy set up.
+
+The steps are configured with the wsgi-preload option of the recipe and are
+run in order, each one logging how long it took to the
+"isotoma.recipe.django.preload" logger.
+"""
+
+import logging
+import time
+
+log = logging.getLogger(__name__)
+
+
+def get_resolver():
+    try:
+        from django.urls import get_resolver
+    except ImportError:
+        from django.core.urlresolvers import get_resolver
+    return get_resolver(None)
+
+
+def warm_urls(application, argument):
+    """ Import the URLconf and every view it refers to """
+    def walk(patterns):
+        for pattern in patterns:
+            if hasattr(pattern, "url_patterns"):
+                walk(pattern.url_patterns)
+            else:
+                pattern.callback
+
+    resolver = get_resolver()
+    walk(resolver.url_patterns)
+    resolver.reverse_dict
+
+
+def warm_models(application, argument):
+    """ Import the models of every installed app """
+    try:
+        from django.apps import apps
+    except ImportError:
+        from django.db.models import get_models
+    else:
+        get_models = apps.get_models
+    get_models()
+
+
+def warm_middleware(application, argument):
+    """ Construct the middleware stack of the handler """
+    if application is not None and \
+            getattr(application, "_request_middleware", True) is None:
+        application.load_middleware()
+
+
+def warm_template(application, argument):
+    """ Load and compile the named template """
+    from django.template.loader import get_template
+    get_template(argument)
+
+
+def warm_templates(application, argument):
+    """ Compile every template in the template directories """
+    from isotoma.recipe.django.templatecache import compile_all
+    compiled, failed = compile_all()
+    log.info("Compiled %d templates, %d failed" % (compiled, failed))
+
+
+def warm_translations(application, argument):
+    """ Load the translation catalogs of the comma separated languages, or
+    of every language in LANGUAGES """
+    from django.conf import settings
+    from django.utils import translation
+
+    if not settings.USE_I18N:
+        log.info("Not loading translations, USE_I18N is off")
+        return
+
+    if argument:
+        codes = [code.strip() for code in argument.split(",") if code.strip()]
+    else:
+        codes = [code for code, name in settings.LANGUAGES]
+
+    try:
+        for code in codes:
+            translation.activate(code)
+    finally:
+        translation.deactivate()
+    log.info("Loaded the translations of %d languages" % len(codes))
+
+
+def warm_url(application, argument):
+    """ Send a GET request for the path through the handler in-process """
+    from wsgiref.util import setup_testing_defaults
+
+    if application is None:
+        from django.core.wsgi import get_wsgi_application
+        application = get_wsgi_application()
+
+    path, _, query = argument.partition("?")
+    environ = {
+        "REQUEST_METHOD": "GET",
+        "PATH_INFO": path,
+        "QUERY_STRING": query,
+    }
+    setup_testing_defaults(environ)
+
+    status = []
+
+    def start_response(response_status, headers, exc_info=None):
+        status.append(response_status)
+        return lambda data: None
+
+    response = application(environ, start_response)
+    try:
+        for data in response:
+            pass
+    finally:
+        if hasattr(response, "close"):
+            response.close()
+
+    log.debug("Preload request for %s returned %s" % (argument, status[0]))
+
+
+STEPS = {
+    "urls": warm_urls,
+    "models": warm_models,
+    "middleware": warm_middleware,
+    "template": warm_template,
+    "templates": warm_templates,
+    "translations": warm_translations,
+    "url": warm_url,
+}
+
+
+def parse_step(step):
+    """ Split a "name" or "name:argument" step into its parts """
+    name, _, argument = step.partition(":")
+    return name.strip(), argument.strip() or None
+
+
+def preload(application, steps):
+    """ Run each of the preload steps against the application. A step that
+    fails is logged and does not stop the worker from starting """
+    started = time.time()
+
+    for step in steps:
+        name, argument = parse_step(step)
+        step_started = time.time()
+        try:
+            STEPS[name](application, argument)
+        except Exception:
+            log.exception("Preload step %s failed" % step)
+            continue
+        log.info("Preloaded %s in %.1fms" % (
+            step,
+            (time.time() - step_started) * 1000
+        ))
+
+    log.info("Preloading finished in %.1fms" % (
+        (time.time() - started) * 1000
+    ))
@@ -0,0 +1,255 @@
+""" A profiler hook installed by the generated scripts, switched on and off at
+run time without a redeploy.
+
+install() is called from the scripts' initialization. While profiling is off
+it costs a signal handler, a receiver on Django's request_started signal and,
+per request, a comparison of the clock with the time the control file was
+last looked at (at most once a second). Profiling is switched on by writing
+to the control file, one mode per line:
+
+requests
+    Profile 1 in N requests with cProfile. The statistics accumulate in
+    <directory>/requests-<host>-<pid>.pstats, rewritten after every profiled
+    request, and the files of several workers can be merged with
+    ``pstats.Stats(*paths)``.
+
+sample
+    Run a stack sampler thread for a window of seconds, recording the stack
+    of every other thread at each interval. The samples are written, as
+    folded stacks ("outer;inner;innermost count" per line, the input of
+    flamegraph.pl and speedscope), to
+    <directory>/sample-<host>-<pid>-<start time>.folded, which can be merged
+    by concatenating them. A sampler is started once per change to the
+    control file.
+
+Sending the process the configured signal also starts a sampler window,
+which works for management commands that never serve a request. A command
+started while the control file asks for sampling is sampled from the start.
+"""
+
+import atexit
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# seconds between looks at the control file
+CHECK_INTERVAL = 1.0
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return "%s (%s:%d)" % (
+        code.co_name,
+        code.co_filename,
+        code.co_firstlineno
+    )
+
+
+def folded_stack(frame):
+    """ The stack of frame as "outer;...;frame" """
+    names = []
+    while frame is not None:
+        names.append(frame_name(frame))
+        frame = frame.f_back
+    names.reverse()
+    return ";".join(names)
+
+
+class Sampler(threading.Thread):
+    """ Records the stacks of the other threads every interval seconds for
+    window seconds, then writes them to path as folded stacks """
+
+    def __init__(self, path, window, interval):
+        super(Sampler, self).__init__(name="isotoma.recipe.django.profiling")
+        self.daemon = True
+        self.path = path
+        self.window = window
+        self.interval = interval
+        self.stacks = {}
+        self.stopped = threading.Event()
+
+    def run(self):
+        me = threading.current_thread().ident
+        finish = time.time() + self.window
+        while time.time() < finish and not self.stopped.is_set():
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id != me:
+                    stack = folded_stack(frame)
+                    self.stacks[stack] = self.stacks.get(stack, 0) + 1
+            self.stopped.wait(self.interval)
+        self.write()
+
+    def stop(self):
+        """ End the window early, writing what has been sampled so far """
+        self.stopped.set()
+        self.join()
+
+    def write(self):
+        output = open(self.path, "w")
+        try:
+            for stack, count in sorted(self.stacks.items()):
+                output.write("%s %d\n" % (stack, count))
+        finally:
+            output.close()
+        log.info("Wrote %d stack samples to %s" % (
+            sum(self.stacks.values()),
+            self.path
+        ))
+
+
+class Profiler(object):
+
+    def __init__(self, directory, control, every=100, window=30.0,
+                 interval=0.01):
+        self.directory = directory
+        self.control = control
+        self.every = max(every, 1)
+        self.window = window
+        self.interval = interval
+
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        # a forked worker starts afresh: the master's sampler thread did not
+        # survive the fork, and its profile is the master's
+        self.pid = os.getpid()
+        self.checked = 0
+        self.control_mtime = None
+        self.modes = ()
+        self.requests = 0
+        self.profile = None
+        self.profiling = None
+        self.sampler = None
+
+    def output_path(self, kind, suffix):
+        if not os.path.isdir(self.directory):
+            try:
+                os.makedirs(self.directory)
+            except OSError:
+                if not os.path.isdir(self.directory):
+                    raise
+        return os.path.join(self.directory, "%s-%s-%d%s" % (
+            kind,
+            socket.gethostname(),
+            os.getpid(),
+            suffix
+        ))
+
+    def check_control(self):
+        """ Read the control file if it has changed, starting a sampler if
+        it asks for one """
+        if self.pid != os.getpid():
+            self.reset()
+        self.checked = time.time()
+        try:
+            mtime = os.stat(self.control).st_mtime
+        except OSError:
+            self.control_mtime = None
+            self.modes = ()
+            return
+
+        if mtime == self.control_mtime:
+            return
+        self.control_mtime = mtime
+        try:
+            self.modes = open(self.control).read().split()
+        except IOError:
+            self.modes = ()
+        if "sample" in self.modes:
+            self.start_sampler()
+
+    def start_sampler(self, *args):
+        if self.sampler is not None and self.sampler.is_alive():
+            return
+        self.sampler = Sampler(
+            self.output_path("sample", "-%d.folded" % time.time()),
+            self.window,
+            self.interval
+        )
+        self.sampler.start()
+
+    def request_started(self, **kwargs):
+        if time.time() - self.checked >= CHECK_INTERVAL or \
+                self.pid != os.getpid():
+            self.check_control()
+        if "requests" not in self.modes:
+            return
+
+        with self.lock:
+            self.requests += 1
+            # one request at a time, cProfile only sees its own thread
+            if self.requests % self.every or self.profiling is not None:
+                return
+            if self.profile is None:
+                import cProfile
+                self.profile = cProfile.Profile()
+            self.profiling = threading.current_thread().ident
+        self.profile.enable()
+
+    def request_finished(self, **kwargs):
+        if self.profiling != threading.current_thread().ident:
+            return
+        self.profile.disable()
+        try:
+            self.write_profile()
+        finally:
+            self.profiling = None
+
+    def write_profile(self):
+        if self.profile is not None and self.pid == os.getpid():
+            self.profile.dump_stats(
+                self.output_path("requests", ".pstats")
+            )
+
+    def finish(self):
+        """ Write out whatever is being collected when the process exits """
+        if self.pid != os.getpid():
+            return
+        if self.sampler is not None and self.sampler.is_alive():
+            self.sampler.stop()
+        self.write_profile()
+
+
+def signal_number(signal_name):
+    """ The number of a signal named with or without its SIG prefix, such as
+    USR2, or None if this platform has no such signal """
+    signal_name = signal_name.upper()
+    if not signal_name.startswith("SIG"):
+        signal_name = "SIG" + signal_name
+    if signal_name.startswith("SIG_"):
+        # SIG_DFL and SIG_IGN are handlers, not signals
+        return None
+    return getattr(signal, signal_name, None)
+
+
+def install(directory, control, every=100, window=30.0, interval=0.01,
+            signal_name=None):
+    """ Install the profiler hook in this process """
+    profiler = Profiler(directory, control, every, window, interval)
+
+    if signal_name:
+        try:
+            signal.signal(signal_number(signal_name), profiler.start_sampler)
+        except (AttributeError, TypeError, ValueError):
+            # not the main thread, as when mod_wsgi imports the script, or a
+            # signal this platform does not have
+            log.warning("Could not install the %s handler" % signal_name)
+
+    try:
+        from django.core.signals import request_started, request_finished
+    except ImportError:
+        pass
+    else:
+        request_started.connect(profiler.request_started, weak=False)
+        request_finished.connect(profiler.request_finished, weak=False)
+
+    atexit.register(profiler.finish)
+    profiler.check_control()
+    return profiler
@@ -0,0 +1,232 @@
+""" Database query accounting for each request and management command.
+
+install() is called at the end of the settings module the recipe generates,
+so it must not touch the database layer while the settings are still being
+loaded. It wraps query execution, using the connections' execute_wrappers on
+Django 2.0 and later and by patching the cursor wrappers before that, and
+keeps, for the request or command running in each thread, the number of
+queries, their total and longest time and how often each query shape (the SQL
+with its literals and placeholders normalized) was run. When a request or
+command finishes past one of the thresholds a warning is logged to the
+"isotoma.recipe.django.queries" logger, with the report in the record's
+``queries`` attribute for handlers that want to send it on. A query shape that
+is run many times in one request is usually an N+1: a query per row of
+another query.
+"""
+
+import atexit
+import logging
+import re
+import sys
+import threading
+import time
+
+# the logger is looked up when a report is logged, not when the settings
+# import this module: a logger that already exists when Django configures
+# LOGGING is disabled, unless the configuration sets disable_existing_loggers
+# to false or names it
+LOGGER = __name__
+
+# normalized shapes are cached by SQL string, and the cache is cleared when
+# it gets this big
+SHAPE_CACHE_SIZE = 5000
+
+LITERALS = re.compile(r"""'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s|\?""")
+LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+
+shapes = {}
+
+
+def query_shape(sql):
+    """ The SQL with its literals and placeholders replaced by ?, and lists of
+    them by (...) """
+    shape = shapes.get(sql)
+    if shape is None:
+        shape = LISTS.sub("(...)", LITERALS.sub("?", sql))
+        shape = " ".join(shape.split())
+        if len(shapes) >= SHAPE_CACHE_SIZE:
+            shapes.clear()
+        shapes[sql] = shape
+    return shape
+
+
+class Scope(object):
+    """ The queries of one request or command """
+
+    def __init__(self, label):
+        self.label = label
+        self.count = 0
+        self.total = 0.0
+        self.longest = 0.0
+        self.shapes = {}
+
+    def add(self, sql, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.longest:
+            self.longest = seconds
+        shape = query_shape(sql)
+        self.shapes[shape] = self.shapes.get(shape, 0) + 1
+
+
+class Accounting(object):
+
+    def __init__(self, max_count=50, max_time=500, max_repeats=10, slow=100):
+        self.max_count = max_count
+        # the times are given in milliseconds
+        self.max_time = max_time / 1000.0
+        self.max_repeats = max_repeats
+        self.slow = slow / 1000.0
+        self.local = threading.local()
+
+    @property
+    def scopes(self):
+        try:
+            return self.local.scopes
+        except AttributeError:
+            scopes = self.local.scopes = []
+            return scopes
+
+    def begin(self, label):
+        self.scopes.append(Scope(label))
+
+    def end(self):
+        if self.scopes:
+            self.report(self.scopes.pop())
+
+    def execute(self, execute, sql, params, many, context):
+        """ An execute wrapper: run execute(sql, params, many, context) and
+        account for it in the current scope """
+        local = self.local
+        if getattr(local, "executing", False) or not self.scopes:
+            return execute(sql, params, many, context)
+
+        local.executing = True
+        started = time.time()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            local.executing = False
+            self.scopes[-1].add(sql, time.time() - started)
+
+    def report(self, scope):
+        if not scope.count:
+            return
+
+        repeated = [
+            (count, shape) for shape, count in scope.shapes.items()
+            if count >= self.max_repeats
+        ]
+        repeated.sort(reverse=True)
+
+        exceeded = []
+        if scope.count > self.max_count:
+            exceeded.append("count")
+        if scope.total > self.max_time:
+            exceeded.append("time")
+        if scope.longest > self.slow:
+            exceeded.append("slow")
+        if repeated:
+            exceeded.append("repeats")
+        if not exceeded:
+            return
+
+        report = {
+            "label": scope.label,
+            "exceeded": exceeded,
+            "count": scope.count,
+            "time": scope.total * 1000,
+            "longest": scope.longest * 1000,
+            "repeated": [
+                {"count": count, "shape": shape}
+                for count, shape in repeated
+            ],
+        }
+        message = "%s: %d queries in %.1fms, the longest %.1fms" % (
+            scope.label,
+            scope.count,
+            scope.total * 1000,
+            scope.longest * 1000
+        )
+        for count, shape in repeated[:3]:
+            message += "; %d times: %s" % (count, shape[:200])
+        logging.getLogger(LOGGER).warning(message, extra={"queries": report})
+
+    def request_started(self, **kwargs):
+        environ = kwargs.get("environ") or {}
+        self.begin(("%s %s" % (
+            environ.get("REQUEST_METHOD", "request"),
+            environ.get("PATH_INFO", "")
+        )).strip())
+
+    def request_finished(self, **kwargs):
+        self.end()
+
+
+def wrap_execute_method(accounting, cls, name):
+    """ Make cls.name (execute or executemany) call accounting.execute """
+    many = name == "executemany"
+    original = cls.__dict__.get(name)
+
+    def method(self, sql, *args):
+        def execute(sql, params, many, context):
+            if original is not None:
+                return original(self, sql, *args)
+            # before Django 1.6 the wrappers pass these straight through
+            return getattr(self.cursor, name)(sql, *args)
+        return accounting.execute(execute, sql, args, many, {"cursor": self})
+
+    method.__name__ = name
+    setattr(cls, name, method)
+
+
+def patch_cursors(accounting):
+    """ Wrap the execute methods of Django's cursor wrappers, for versions
+    without execute_wrappers """
+    try:
+        from django.db.backends import utils
+    except ImportError:
+        from django.db.backends import util as utils
+
+    for cls in (utils.CursorWrapper, utils.CursorDebugWrapper):
+        if not cls.__dict__.get("_query_accounting"):
+            cls._query_accounting = True
+            wrap_execute_method(accounting, cls, "execute")
+            wrap_execute_method(accounting, cls, "executemany")
+
+
+def install(max_count=50, max_time=500, max_repeats=10, slow=100):
+    """ Start accounting for the queries of requests and of this process,
+    reporting those that exceed max_count queries, max_time milliseconds in
+    total, run a query shape max_repeats times or have a query slower than
+    slow milliseconds """
+    import django
+    from django.core.signals import request_started, request_finished
+
+    accounting = Accounting(max_count, max_time, max_repeats, slow)
+
+    if django.VERSION >= (2, 0):
+        from django.db.backends.signals import connection_created
+
+        def add_wrapper(connection, **kwargs):
+            if accounting.execute not in connection.execute_wrappers:
+                connection.execute_wrappers.append(accounting.execute)
+        connection_created.connect(add_wrapper, weak=False)
+    elif django.VERSION >= (1, 7):
+        patch_cursors(accounting)
+    else:
+        # importing the database layer reads the settings, which are still
+        # being loaded, so wait for the first request
+        def patch(**kwargs):
+            patch_cursors(accounting)
+            request_started.disconnect(patch)
+        request_started.connect(patch, weak=False)
+
+    request_started.connect(accounting.request_started, weak=False)
+    request_finished.connect(accounting.request_finished, weak=False)
+
+    # everything outside a request, which is all of a management command
+    accounting.begin(" ".join(sys.argv[:2]))
+    atexit.register(accounting.end)
+
+    return accounting
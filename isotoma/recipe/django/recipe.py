@@ -1,13 +1,24 @@
+import hashlib
+import json
 import logging
 import os
+import re
+import shutil
+import subprocess
 import sys
+import tempfile
 import textwrap
 
+import zc.buildout
 import zc.recipe.egg
 from zc.buildout import easy_install
-from pkg_resources import parse_version
+from pkg_resources import parse_version, WorkingSet
+
+from isotoma.recipe.django import bytecode, catalogs, collectstatic, paths, \
+    preload, profiling, resolution, serverconfig
 
 django_1_5 = parse_version('1.5')
+django_3_0 = parse_version('3.0')
 
 class Recipe(zc.recipe.egg.Egg):
     """ A buildout recipe to install django, and configure a project """
@@ -30,6 +41,27 @@ class Recipe(zc.recipe.egg.Egg):
         self.options.setdefault("settings", "settings")
         # whether to generate a wsgi file
         self.options.setdefault("wsgi", "false")
+        # whether to generate an asgi file
+        self.options.setdefault("asgi", "false")
+        if self.options["asgi"].lower() == "true" and \
+                self.django_version < django_3_0:
+            raise zc.buildout.UserError("asgi needs Django 3.0 or later")
+
+        # whether the wsgi and asgi scripts run the system checks, once for
+        # the code and settings recorded in wsgi-checks-record
+        self.options.setdefault("wsgi-checks", "false")
+        self.options.setdefault(
+            "wsgi-checks-record",
+            os.path.join(
+                buildout["buildout"]["directory"],
+                "var",
+                "%s-checks" % self.name
+            )
+        )
+
+        # whether the resolved working set is shared with the other parts
+        # and cached between runs
+        self.options.setdefault("working-set-cache", "true")
 
         # get the extra paths that we might need
         if self.options.has_key("extra-paths"):
@@ -40,6 +72,23 @@ class Recipe(zc.recipe.egg.Egg):
         else:
             self.extra_paths = []
 
+        # whether the generated scripts and settings find the files of the
+        # buildout relative to their own location, so that the built tree
+        # can be moved or copied elsewhere
+        self.options.setdefault(
+            "relative-paths",
+            buildout["buildout"].get("relative-paths", "false")
+        )
+        if self.options["relative-paths"].lower() == "true":
+            self.relative_paths = buildout["buildout"]["directory"]
+            if self.options.get("freeze-settings", "").lower() == "true":
+                raise zc.buildout.UserError(
+                    "freeze-settings cannot be used with relative-paths, as "
+                    "the frozen values hold the paths of the build"
+                )
+        else:
+            self.relative_paths = None
+
         # which environment variables to set
         self.environment_vars = {}
         for option in self.options.keys():
@@ -49,41 +98,447 @@ class Recipe(zc.recipe.egg.Egg):
         # Special env-variable case for bin-on-path
         if self.options.get("bin-on-path", "").lower() in ["true", "yes", "on"]:
             self.environment_vars["PATH"] = \
-                "'%s' + os.pathsep + os.environ['PATH']\n" % (
-                    self.options["bin-directory"]
+                "%s + os.pathsep + os.environ['PATH']\n" % (
+                    self.path_code(self.options["bin-directory"])
                 )
 
-        if self.django_version >= django_1_5:
-            self.settings_import = "import os\nos.environ.setdefault('DJANGO_SETTINGS_MODULE', '%s.%s')" % (
-                self.options["project"],
-                self.options["settings"]
+        self.use_settings_module("%s.%s" % (
+            self.options["project"],
+            self.options["settings"]
+        ))
+
+        self.extra_settings = self.options.get("extra-settings", None)
+        # code the recipe's own options add to the end of the generated
+        # settings module
+        self.settings_code = []
+
+        # whether the settings install the per-request query accounting, and
+        # the thresholds past which a request or command is reported
+        self.options.setdefault("query-accounting", "false")
+        self.options.setdefault("query-max-count", "50")
+        self.options.setdefault("query-max-time", "500")
+        self.options.setdefault("query-max-repeats", "10")
+        self.options.setdefault("query-slow", "100")
+        if self.options["query-accounting"].lower() == "true":
+            try:
+                thresholds = (
+                    int(self.options["query-max-count"]),
+                    float(self.options["query-max-time"]),
+                    int(self.options["query-max-repeats"]),
+                    float(self.options["query-slow"]),
+                )
+            except ValueError:
+                raise zc.buildout.UserError(
+                    "query-max-count and query-max-repeats must be integers, "
+                    "and query-max-time and query-slow milliseconds"
+                )
+            self.settings_code.append(textwrap.dedent("""\
+            import isotoma.recipe.django.queries
+            isotoma.recipe.django.queries.install(%r, %r, %r, %r)
+            """) % thresholds)
+
+        # whether to write the evaluated settings out as a flat module
+        self.options.setdefault("freeze-settings", "false")
+
+        # whether bin/django hands commands to a warm server process
+        self.options.setdefault("command-server", "false")
+        self.options.setdefault(
+            "command-server-socket",
+            os.path.join(
+                buildout["buildout"]["directory"],
+                "var",
+                "%s.sock" % self.options["control-script"]
             )
-        else:
-            self.settings_import = "import %s.%s as settings" % (
-                self.options["project"],
-                self.options["settings"]
+        )
+
+        # whether to build an index of the management commands at install
+        # time for the control script to use
+        self.options.setdefault("command-index", "false")
+        self.command_index = None
+
+        # the management commands to generate dedicated scripts for
+        self.commands = self.options.get("commands", "").split()
+
+        # whether to collect the static files at install time, and which
+        # precompressed variants to write alongside them
+        self.options.setdefault("collectstatic", "false")
+        self.options.setdefault("static-compress", "gzip")
+        for compressor in self.options["static-compress"].split():
+            if compressor not in collectstatic.COMPRESSORS:
+                raise zc.buildout.UserError(
+                    "Unknown static-compress format %r, expected one of: "
+                    "%s" % (
+                        compressor,
+                        ", ".join(sorted(collectstatic.COMPRESSORS))
+                    )
+                )
+
+        # whether to compile the gettext catalogs at install time
+        self.options.setdefault("compilemessages", "false")
+
+        # whether to precompile the project and working set at install time
+        self.options.setdefault("compile-bytecode", "false")
+
+        # how the working set is put on sys.path by the generated scripts
+        self.options.setdefault("path-mode", "eggs")
+        if self.options["path-mode"] not in ("eggs", "farm", "index"):
+            raise zc.buildout.UserError(
+                "path-mode must be one of eggs, farm or index"
             )
+        # the path entries and set up code that replace the working set when
+        # it is collapsed by path-mode
+        self.path_entries = []
+        self.path_initialization = ""
 
-        self.extra_settings = self.options.get("extra-settings", None)
+        # the steps used to warm up the wsgi application when it is imported
+        self.wsgi_preload = [
+            step.strip() for step in
+            self.options.get("wsgi-preload", "").split("\n")
+            if step.strip()
+        ]
+        for step in self.wsgi_preload:
+            if preload.parse_step(step)[0] not in preload.STEPS:
+                raise zc.buildout.UserError(
+                    "Unknown wsgi-preload step %r, expected one of: %s" % (
+                        step,
+                        ", ".join(sorted(preload.STEPS))
+                    )
+                )
+
+        # whether the settings wrap the template loaders in the cached
+        # loader, which the wsgi script then fills with every template
+        self.options.setdefault("template-cache", "false")
+        if self.options["template-cache"].lower() == "true":
+            self.settings_code.append(textwrap.dedent("""\
+            import isotoma.recipe.django.templatecache
+            globals().update(
+                isotoma.recipe.django.templatecache.cached_loaders(globals())
+            )
+            """))
+            self.insert_preload_step("templates")
+
+        # whether the wsgi script loads every translation catalog, so that
+        # forked workers share them rather than each reading its own
+        self.options.setdefault("preload-translations", "false")
+        if self.options["preload-translations"].lower() == "true":
+            self.insert_preload_step("translations")
+
+        # whether to freeze the heap once the wsgi application is loaded, and
+        # the garbage collector thresholds to use after that
+        self.options.setdefault("wsgi-gc-freeze", "false")
+        try:
+            self.wsgi_gc_thresholds = [
+                int(threshold) for threshold in
+                self.options.get("wsgi-gc-thresholds", "").split()
+            ]
+        except ValueError:
+            raise zc.buildout.UserError(
+                "wsgi-gc-thresholds must be up to three integers"
+            )
+        if len(self.wsgi_gc_thresholds) > 3:
+            raise zc.buildout.UserError(
+                "wsgi-gc-thresholds must be up to three integers"
+            )
+
+        # whether the wsgi application serves the static files itself
+        self.options.setdefault("wsgi-static", "false")
+        max_age = self.options.get("wsgi-static-max-age", "")
+        if max_age and not max_age.isdigit():
+            raise zc.buildout.UserError(
+                "wsgi-static-max-age must be a number of seconds"
+            )
+
+        # whether to wrap the wsgi and asgi applications in the request
+        # instrumentation, configured by the instrument.* options
+        self.options.setdefault("instrument", "false")
+        self.instrument = {
+            "socket": os.path.join(
+                buildout["buildout"]["directory"],
+                "var",
+                "%s-metrics.sock" % self.options["control-script"]
+            ),
+            "interval": "1.0",
+            "buckets": "",
+        }
+        for option in self.options.keys():
+            if option.startswith("instrument."):
+                if option[11:] not in self.instrument:
+                    raise zc.buildout.UserError(
+                        "Unknown option %s, expected one of: %s" % (
+                            option,
+                            ", ".join(
+                                "instrument.%s" % key
+                                for key in sorted(self.instrument)
+                            )
+                        )
+                    )
+                self.instrument[option[11:]] = self.options[option]
+        try:
+            float(self.instrument["interval"])
+            [int(bucket) for bucket in self.instrument["buckets"].split()]
+        except ValueError:
+            raise zc.buildout.UserError(
+                "instrument.interval must be a number of seconds and "
+                "instrument.buckets a list of milliseconds"
+            )
+
+        # the application server configurations to generate next to the
+        # wsgi script, sized to the host and configured by the server.*
+        # options
+        self.servers = self.options.get("server-config", "").split()
+        for server in self.servers:
+            if server not in serverconfig.SERVERS:
+                raise zc.buildout.UserError(
+                    "Unknown server-config %r, expected one of: %s" % (
+                        server,
+                        ", ".join(serverconfig.SERVERS)
+                    )
+                )
+        if self.servers and self.options["wsgi"].lower() != "true":
+            raise zc.buildout.UserError("server-config needs wsgi = true")
+        server_options = {}
+        for option in self.options.keys():
+            if option.startswith("server."):
+                if option[7:] not in serverconfig.DEFAULTS:
+                    raise zc.buildout.UserError(
+                        "Unknown option %s, expected one of: %s" % (
+                            option,
+                            ", ".join(
+                                "server.%s" % key
+                                for key in sorted(serverconfig.DEFAULTS)
+                            )
+                        )
+                    )
+                server_options[option[7:]] = self.options[option]
+        try:
+            self.server_settings = serverconfig.size(
+                server_options,
+                serverconfig.cpu_count(),
+                serverconfig.memory()
+            )
+        except ValueError:
+            raise zc.buildout.UserError(
+                "server.workers, server.threads, server.max-requests, "
+                "server.max-requests-jitter, server.timeout and "
+                "server.worker-memory must be integers"
+            )
+
+        # whether the generated scripts install the profiler hook, and how
+        # it profiles once it is switched on
+        self.options.setdefault("profile", "false")
+        self.options.setdefault(
+            "profile-directory",
+            os.path.join(buildout["buildout"]["directory"], "var", "profiles")
+        )
+        self.options.setdefault(
+            "profile-control",
+            os.path.join(self.options["profile-directory"], "control")
+        )
+        self.options.setdefault("profile-requests", "100")
+        self.options.setdefault("profile-window", "30")
+        self.options.setdefault("profile-interval", "0.01")
+        try:
+            int(self.options["profile-requests"])
+            float(self.options["profile-window"])
+            float(self.options["profile-interval"])
+        except ValueError:
+            raise zc.buildout.UserError(
+                "profile-requests must be an integer, and profile-window and "
+                "profile-interval numbers of seconds"
+            )
+        profile_signal = self.options.get("profile-signal")
+        if profile_signal and profiling.signal_number(profile_signal) is None:
+            raise zc.buildout.UserError(
+                "profile-signal %r is not a signal on this platform" % (
+                    profile_signal,
+                )
+            )
+
+        # whether the settings configure a cache shared by the workers of the
+        # host in a memory-mapped file
+        self.options.setdefault("mmap-cache", "false")
+        self.options.setdefault("mmap-cache-alias", "default")
+        self.options.setdefault(
+            "mmap-cache-location",
+            os.path.join(
+                buildout["buildout"]["directory"],
+                "var",
+                "%s-cache.mmap" % self.name
+            )
+        )
+        self.options.setdefault("mmap-cache-size", "64")
+        self.options.setdefault("mmap-cache-ways", "8")
+        self.options.setdefault("mmap-cache-slot-size", "4096")
+        if self.options["mmap-cache"].lower() == "true":
+            try:
+                megabytes = int(self.options["mmap-cache-size"])
+                cache_options = {
+                    "SIZE": megabytes * 1024 * 1024,
+                    "WAYS": int(self.options["mmap-cache-ways"]),
+                    "SLOT_SIZE": int(self.options["mmap-cache-slot-size"]),
+                }
+            except ValueError:
+                raise zc.buildout.UserError(
+                    "mmap-cache-size (in megabytes), mmap-cache-ways and "
+                    "mmap-cache-slot-size must be integers"
+                )
+            self.settings_code.append(textwrap.dedent("""\
+            CACHES = dict(globals().get("CACHES") or {})
+            CACHES[%r] = {
+                "BACKEND": "isotoma.recipe.django.mmapcache.MmapCache",
+                "LOCATION": %s,
+                "OPTIONS": %r,
+            }
+            """) % (
+                self.options["mmap-cache-alias"],
+                self.module_path_code(self.options["mmap-cache-location"]),
+                cache_options,
+            ))
+
+        # how long database connections are kept open, whether they are
+        # checked before being reused, and whether closed connections go to a
+        # per-process pool
+        database_settings = {}
+        max_age = self.options.get("db-conn-max-age", "")
+        if max_age:
+            if max_age.lower() == "none":
+                database_settings["CONN_MAX_AGE"] = None
+            elif max_age.isdigit():
+                database_settings["CONN_MAX_AGE"] = int(max_age)
+            else:
+                raise zc.buildout.UserError(
+                    "db-conn-max-age must be a number of seconds or none"
+                )
+        health_checks = self.options.get("db-conn-health-checks", "")
+        if health_checks:
+            database_settings["CONN_HEALTH_CHECKS"] = \
+                health_checks.lower() == "true"
+        if database_settings:
+            self.settings_code.append(textwrap.dedent("""\
+            DATABASES = dict(
+                (alias, dict(config, **%r))
+                for alias, config in (globals().get("DATABASES") or {}).items()
+            )
+            """) % (database_settings, ))
+
+        self.options.setdefault("db-pool", "false")
+        self.options.setdefault("db-pool-size", "10")
+        self.options.setdefault("db-pool-idle", "300")
+        self.options.setdefault("db-pool-pre-ping", "true")
+        if self.options["db-pool"].lower() == "true":
+            try:
+                pool = (
+                    int(self.options["db-pool-size"]),
+                    int(self.options["db-pool-idle"]),
+                    self.options["db-pool-pre-ping"].lower() == "true",
+                )
+            except ValueError:
+                raise zc.buildout.UserError(
+                    "db-pool-size and db-pool-idle (in seconds) must be "
+                    "integers"
+                )
+            self.settings_code.append(textwrap.dedent("""\
+            import isotoma.recipe.django.dbpool
+            isotoma.recipe.django.dbpool.install(
+                globals().get("DATABASES") or {}, %r, %r, %r)
+            """) % pool)
+
+        # the resolved working set, filled in on first use
+        self._working_set = None
+
+        # the source files of the settings, as imported by freeze-settings
+        # and command-index, whose output goes stale when they change
+        self.settings_sources = set()
+
+        # the generated files whose content changed during this run
+        self.changed_files = []
+
+    @property
+    def part_directory(self):
+        """ The directory in parts that holds this part's generated files """
+        return os.path.join(
+            self.buildout["buildout"]["parts-directory"],
+            self.name
+        )
+
+    def make_part_directory(self):
+        """ Create the part directory if necessary and return its path """
+        container_dir = self.part_directory
+        if not os.path.exists(container_dir):
+            os.mkdir(container_dir, 0755)
+        if container_dir not in self.options.created():
+            self.options.created(container_dir)
+        return container_dir
+
+    def get_working_set(self):
+        """ Resolve the working set used by the scripts, once per run, through
+        the cache shared with the other parts unless working-set-cache is
+        off """
+        if self._working_set is not None:
+            return self._working_set
+
+        if self.options["working-set-cache"].lower() != "true":
+            self._working_set = self.working_set(
+                extra=('isotoma.recipe.django',)
+            )[1]
+            return self._working_set
+
+        b_options = self.buildout["buildout"]
+        versions = dict(self.buildout.get(
+            b_options.get("versions", "versions")
+        ) or {})
+        newest = b_options.get("newest") == "true"
+        offline = b_options.get("offline") == "true"
+        requirements = [
+            requirement.strip() for requirement in
+            self.options.get("eggs", self.default_eggs).split("\n")
+            if requirement.strip()
+        ] + ["isotoma.recipe.django"]
+
+        key = resolution.cache_key(
+            requirements,
+            self.options["executable"],
+            versions,
+            self.index,
+            self.links,
+            self.allow_hosts,
+            newest,
+            offline,
+            self.options.get("unzip"),
+            self.options["eggs-directory"],
+            self.options["develop-eggs-directory"]
+        )
+        cache_path = os.path.join(
+            b_options["parts-directory"],
+            "isotoma.recipe.django-working-sets.json"
+        )
+
+        ws = resolution.lookup(
+            cache_path, key, versions, newest and not offline
+        )
+        if ws is None:
+            ws = self.working_set(extra=('isotoma.recipe.django',))[1]
+            resolution.store(cache_path, key, ws)
+        else:
+            self.log.debug("Using the cached working set %s" % key)
+        self._working_set = ws
+        return ws
 
     def configure_extra_settings(self, extra_settings):
         """Create a directory in parts containing a settings module that, in
         an generated settings file imports * from the project settings then
-        adds the extra-settings string to the file. Then add the directory to
-        sys.path and ensure that the initialization string imports from the new
-        settings file"""
+        adds the extra-settings string and the code of the recipe's own
+        options to the file. Then add the directory to sys.path and ensure
+        that the initialization string imports from the new settings file"""
 
         EXTRA_SETTINGS_TEMPLATE = textwrap.dedent("""\
-        from %(project)s.%(project_settings)s import *
+        %(base)sfrom %(project)s.%(project_settings)s import *
 
         %(extra_settings)s
-        """)
+        %(settings_code)s""")
 
         # Create a settings directory to add to sys.path in parts-directory.
-        container_dir = os.path.join(
-            self.buildout["buildout"]["parts-directory"],
-            self.name
-        )
+        container_dir = self.make_part_directory()
         module_name = "%s_extrasettings" % self.name
         settings_name = "settings"
 
@@ -91,45 +546,266 @@ class Recipe(zc.recipe.egg.Egg):
         init_filepath = os.path.join(settings_dir, "__init__.py")
         settings_filepath = os.path.join(settings_dir, "%s.py" % settings_name)
 
-        if not os.path.exists(container_dir):
-            os.mkdir(container_dir, 0755)
-
         if not os.path.exists(settings_dir):
             os.mkdir(settings_dir, 0755)
 
-        if not os.path.exists(init_filepath):
-            open(init_filepath, "w").close()
+        self.write_file(init_filepath, "")
 
-        settings_file = open(settings_filepath, "w")
-
-        settings_file.write(EXTRA_SETTINGS_TEMPLATE % {
+        self.write_file(settings_filepath, EXTRA_SETTINGS_TEMPLATE % {
+            "base": self.module_base_code(settings_dir),
             "project": self.options["project"],
             "project_settings": self.options["settings"],
-            "extra_settings": self.options["extra-settings"],
+            "extra_settings": extra_settings or "",
+            "settings_code": "\n".join(self.settings_code),
         })
-        settings_file.close()
 
         # Set the new import line
-        self.settings_import = "import %s.%s as settings" % (
-            module_name,
-            settings_name
-        )
+        self.use_settings_module("%s.%s" % (module_name, settings_name))
 
         # Add the new settings directory to sys.path
         self.extra_paths.append(container_dir)
 
         self.options.created(
-            container_dir,
             settings_dir,
             init_filepath,
             settings_filepath,
         )
 
+    def freeze_settings(self):
+        """ Evaluate the settings module at build time and, if every setting
+        can be written as a literal that evaluates back to its live value,
+        make the scripts import a flat module of those values instead """
+        try:
+            result = self.run_in_target(
+                "from isotoma.recipe.django.freeze import main\n"
+                "main(%r)" % self.settings_module
+            )
+        except subprocess.CalledProcessError:
+            self.log.warning(
+                "Not freezing settings: %s could not be evaluated" % (
+                    self.settings_module,
+                )
+            )
+            return
+        self.settings_sources.update(result["sources"])
+
+        if result["unrepresentable"]:
+            self.log.warning(
+                "Not freezing settings: %s cannot be written as literals" % (
+                    ", ".join(result["unrepresentable"]),
+                )
+            )
+            return
+
+        if result["mismatched"]:
+            self.log.warning(
+                "Not freezing settings: %s do not match their live values" % (
+                    ", ".join(result["mismatched"]),
+                )
+            )
+            return
+
+        container_dir = self.make_part_directory()
+        module_name = "%s_frozensettings" % self.name
+
+        settings_dir = os.path.join(container_dir, module_name)
+        init_filepath = os.path.join(settings_dir, "__init__.py")
+        settings_filepath = os.path.join(settings_dir, "settings.py")
+
+        if not os.path.exists(settings_dir):
+            os.mkdir(settings_dir, 0755)
+
+        self.write_file(init_filepath, "")
+        # the recipe's code does not survive being evaluated, so it follows
+        # the frozen values
+        self.write_file(settings_filepath, "\n".join(
+            [result["source"]] + self.settings_code
+        ))
+
+        self.use_settings_module("%s.settings" % module_name)
+
+        if container_dir not in self.extra_paths:
+            self.extra_paths.append(container_dir)
+
+        self.options.created(
+            settings_dir,
+            init_filepath,
+            settings_filepath,
+        )
+
+    def build_command_index(self):
+        """ Record which app provides each management command, with the
+        settings of the generated scripts """
+        try:
+            index = self.run_in_target(
+                "from isotoma.recipe.django.commands import main\nmain()"
+            )
+        except subprocess.CalledProcessError:
+            self.log.warning(
+                "Not indexing management commands: they could not be listed"
+            )
+            return
+        self.settings_sources.update(index.pop("sources"))
+
+        self.command_index = os.path.join(
+            self.make_part_directory(),
+            "commands.json"
+        )
+        self.write_file(
+            self.command_index,
+            json.dumps(index, indent=4, sort_keys=True)
+        )
+        self.options.created(self.command_index)
+
+    def command_apps(self):
+        """ Return the {command: app} mapping for the scripts' settings,
+        from the command index if there is one. If the commands cannot be
+        listed the mapping is empty and the scripts look their app up when
+        they run """
+        if self.command_index:
+            index = json.load(open(self.command_index))
+        else:
+            try:
+                index = self.run_in_target(
+                    "from isotoma.recipe.django.commands import main\nmain()"
+                )
+            except subprocess.CalledProcessError:
+                self.log.warning(
+                    "Could not list the management commands, the command "
+                    "scripts will look them up when they run"
+                )
+                return {}
+
+        apps = dict(
+            (str(command), str(app))
+            for command, app in index["commands"].items()
+        )
+        for command in self.commands:
+            if command not in apps:
+                raise zc.buildout.UserError(
+                    "Unknown management command %r in commands" % command
+                )
+        return apps
+
+    def collect_static(self):
+        """ Collect the static files found by the scripts' settings into the
+        static root, skipping unchanged files and writing precompressed
+        variants in parallel """
+        compress = self.options["static-compress"].split()
+        if "brotli" in compress and collectstatic.brotli is None:
+            self.log.warning(
+                "Not writing brotli variants: the brotli module is not "
+                "installed"
+            )
+            compress.remove("brotli")
+
+        try:
+            found = self.run_in_target(
+                "from isotoma.recipe.django.collectstatic import main\n"
+                "main()"
+            )
+        except subprocess.CalledProcessError:
+            raise zc.buildout.UserError("Could not list the static files")
+
+        static_root = self.options.get("static-root") or found["static_root"]
+        if not static_root:
+            raise zc.buildout.UserError(
+                "collectstatic needs static-root or STATIC_ROOT to be set"
+            )
+
+        manifest_path = os.path.join(
+            self.make_part_directory(),
+            "static-manifest.json"
+        )
+        manifest = {}
+        if os.path.exists(manifest_path):
+            manifest = json.load(open(manifest_path))
+
+        copied, skipped, processed, seconds = collectstatic.collect(
+            found["files"],
+            static_root,
+            manifest,
+            compress,
+            int(self.options.get("static-workers", 0)) or None
+        )
+
+        manifest_file = open(manifest_path, "w")
+        json.dump(manifest, manifest_file)
+        manifest_file.close()
+        self.options.created(manifest_path)
+
+        self.log.info(
+            "Collected %d static files (%d bytes) into %s and skipped %d "
+            "unchanged in %.2fs" % (
+                copied,
+                processed,
+                static_root,
+                skipped,
+                seconds
+            )
+        )
+
+    def use_settings_module(self, module):
+        """ Make the generated scripts use the named settings module """
+        self.settings_module = module
+        if self.django_version >= django_1_5:
+            self.settings_import = "import os\nos.environ.setdefault('DJANGO_SETTINGS_MODULE', '%s')" % (
+                module,
+            )
+        else:
+            self.settings_import = "import %s as settings" % module
+
+    def run_in_target(self, code):
+        """ Run python code with the interpreter, working set and
+        initialization of the generated scripts. The code is given the name of
+        a file to write JSON to as sys.argv[1], and that JSON is returned """
+        path = [dist.location for dist in self.get_working_set()]
+        path += self.extra_paths
+
+        # the initialization refers to the files of the buildout through
+        # these with relative-paths, see path_code
+        script = "import os\njoin = os.path.join\nbase = %r\n" % (
+            self.buildout["buildout"]["directory"],
+        )
+        script += "import sys\nsys.path[0:0] = %r\n%s\n%s\n" % (
+            path,
+            self.initialization(),
+            code
+        )
+
+        # the settings module comes from the initialization, not from the
+        # environment buildout happens to be running in
+        env = dict(os.environ)
+        env.pop("DJANGO_SETTINGS_MODULE", None)
+
+        fd, output = tempfile.mkstemp(suffix=".json")
+        os.close(fd)
+        try:
+            subprocess.check_call(
+                [self.options["executable"], "-c", script, output],
+                env=env
+            )
+            return json.load(open(output))
+        finally:
+            os.remove(output)
+
     def install(self):
         """ Create and set up the project """
-        if self.extra_settings:
+        if self.extra_settings or self.settings_code:
             self.configure_extra_settings(self.extra_settings)
 
+        if self.options["freeze-settings"].lower() == "true":
+            self.freeze_settings()
+
+        if self.options["command-index"].lower() == "true":
+            self.build_command_index()
+
+        if self.settings_sources:
+            self.record_settings_sources()
+
+        if self.options["collectstatic"].lower() == "true":
+            self.collect_static()
+
         # the base directory for the installed files
         base_dir = self.buildout["buildout"]["directory"] 
         src_dir = os.path.join(base_dir, "src")
@@ -138,25 +814,144 @@ class Recipe(zc.recipe.egg.Egg):
         # install the control scripts for django
         self.install_scripts(src_dir, project_dir)
 
+        if self.options["compilemessages"].lower() == "true":
+            self.compile_messages(project_dir)
+
+        if self.options["compile-bytecode"].lower() == "true":
+            self.compile_bytecode(project_dir)
+
+        self.record_fingerprint(self.fingerprint())
+        self.report_changed_files()
+
         return self.options.created()
 
+    def update(self):
+        """ Re-run the install, unless nothing it depends on has changed """
+        fingerprint = self.fingerprint()
+        reason = self.check_fingerprint(fingerprint)
+        if reason is None:
+            self.log.debug(
+                "Skipping update: fingerprint %s is unchanged and all "
+                "generated files are present" % fingerprint
+            )
+            # edited static files, .po files and python sources do not
+            # change the fingerprint, and these stages skip what is up to
+            # date cheaply
+            project_dir = os.path.join("src", self.options["project"])
+            if self.options["collectstatic"].lower() == "true":
+                self.collect_static()
+            if self.options["compilemessages"].lower() == "true":
+                self.compile_messages(project_dir)
+            if self.options["compile-bytecode"].lower() == "true":
+                self.compile_bytecode(project_dir)
+            self.report_changed_files()
+            return
+        self.log.debug("Updating: %s" % reason)
+        return self.install()
+
+    def fingerprint(self):
+        """ Return a hash of the effective inputs of the part: its options,
+        the resolved distributions, the templates, the Django version and the
+        settings sources freeze-settings and command-index read """
+        sha = hashlib.sha1()
+
+        for key, value in sorted(self.options.items()):
+            sha.update("option %s = %s\n" % (key, value))
+
+        for dist in self.get_working_set():
+            sha.update("dist %s %s %s\n" % (
+                dist.project_name,
+                dist.version,
+                dist.location
+            ))
+
+        sha.update("django %r\n" % (self.django_version, ))
+
+        if self.servers:
+            # the server configurations are sized to the host
+            sha.update("host %s\n" % serverconfig.describe(
+                serverconfig.cpu_count(),
+                serverconfig.memory()
+            ))
+
+        templates_dir = os.path.join(os.path.dirname(__file__), "templates")
+        for template in sorted(os.listdir(templates_dir)):
+            sha.update("template %s\n" % template)
+            sha.update(open(os.path.join(templates_dir, template)).read())
+
+        sha.update(easy_install.script_header)
+        sha.update(easy_install.script_template)
+
+        sources_path = self.settings_sources_path()
+        if os.path.exists(sources_path):
+            for source in json.load(open(sources_path)):
+                sha.update("settings source %s\n" % source)
+                if os.path.exists(source):
+                    sha.update(open(source, "rb").read())
+
+        return sha.hexdigest()
+
+    def fingerprint_path(self):
+        return os.path.join(self.part_directory, "fingerprint")
+
+    def settings_sources_path(self):
+        return os.path.join(self.part_directory, "settings-sources.json")
+
+    def record_settings_sources(self):
+        """ Record the settings sources, so the fingerprint changes with
+        them and the frozen settings and command index are built again """
+        self.make_part_directory()
+        path = self.settings_sources_path()
+        self.write_file(
+            path,
+            json.dumps(sorted(self.settings_sources), indent=4)
+        )
+        self.options.created(path)
+
+    def record_fingerprint(self, fingerprint):
+        """ Store the fingerprint along with the files that were generated
+        for it, so the next update can tell whether there is work to do """
+        self.make_part_directory()
+        path = self.fingerprint_path()
+        self.options.created(path)
+
+        outputs = [p for p in self.options.created() if p != path]
+        record = open(path, "w")
+        record.write("\n".join([fingerprint] + outputs) + "\n")
+        record.close()
+
+    def check_fingerprint(self, fingerprint):
+        """ Return None if the recorded fingerprint matches and all the
+        recorded outputs exist, otherwise the reason an update is needed """
+        path = self.fingerprint_path()
+        if not os.path.exists(path):
+            return "no fingerprint recorded"
+
+        lines = open(path).read().splitlines()
+        if not lines or lines[0] != fingerprint:
+            return "fingerprint changed"
+
+        for output in lines[1:]:
+            if not os.path.exists(output):
+                return "%s is missing" % output
+
+        return None
+
 
     def install_scripts(self, source_dir, project_dir):
         """ Install the control scripts that we need """
 
         # use the working set to correctly create the scripts with the correct
         # python path
-        ws = self.working_set(extra=('isotoma.recipe.django',))[1]
+        ws = self.configure_path_mode(self.get_working_set())
 
-        easy_install.scripts(
+        self.generate_scripts(
             [(
                 "django-admin",
                 "django.core.management",
                 "execute_from_command_line"
             )],
             ws,
-            self.options['executable'],
-            self.options['bin-directory'],
             extra_paths = self.extra_paths
         )
 
@@ -166,52 +961,156 @@ class Recipe(zc.recipe.egg.Egg):
         # doesn't seem to be much success
 
         # install the project script ("manage.py")
-        easy_install.scripts(
-            [(
-                self.options["control-script"],
-                "django.core.management",
-                "execute_from_command_line"
-            )],
-            ws,
-            self.options['executable'],
-            self.options['bin-directory'],
-            arguments="sys.argv",
-            initialization=self.initialization(),
-            extra_paths = self.extra_paths
-        )
+        if self.options["command-server"].lower() == "true":
+            # a client that hands the command to a warm server when one is
+            # running, and the server itself
+            socket_path = self.options["command-server-socket"]
+            self.generate_scripts(
+                [(
+                    self.options["control-script"],
+                    "isotoma.recipe.django.cmdserver",
+                    "client"
+                )],
+                ws,
+                arguments="%s, sys.argv, %s" % (
+                    self.path_code(socket_path),
+                    self.path_code(self.command_index)
+                ),
+                initialization=self.initialization(),
+                extra_paths = self.extra_paths
+            )
+            self.generate_scripts(
+                [(
+                    "%s-server" % self.options["control-script"],
+                    "isotoma.recipe.django.cmdserver",
+                    "serve"
+                )],
+                ws,
+                arguments="%s, %s" % (
+                    self.path_code(socket_path),
+                    self.path_code(self.command_index)
+                ),
+                initialization=self.initialization(),
+                extra_paths = self.extra_paths
+            )
+            self.options.created(os.path.join(
+                self.options["bin-directory"],
+                "%s-server" % self.options["control-script"]
+            ))
+        elif self.command_index:
+            self.generate_scripts(
+                [(
+                    self.options["control-script"],
+                    "isotoma.recipe.django.commands",
+                    "execute_from_command_line"
+                )],
+                ws,
+                arguments="%s, sys.argv" % self.path_code(self.command_index),
+                initialization=self.initialization(),
+                extra_paths = self.extra_paths
+            )
+        else:
+            self.generate_scripts(
+                [(
+                    self.options["control-script"],
+                    "django.core.management",
+                    "execute_from_command_line"
+                )],
+                ws,
+                arguments="sys.argv",
+                initialization=self.initialization(),
+                extra_paths = self.extra_paths
+            )
 
-        # install the wsgi script if required
-        if self.options["wsgi"].lower() == "true":
-            # the name of the wsgi script that will end up in bin-directory
-            wsgi_name = "%s.%s" % (self.options["control-script"], "wsgi")
-            # install the wsgi script
-            # we need to reset the template, as we need a custom script, rather
-            # than the standard buildout one
+        # install a script for each of the commands that should skip the
+        # control script's dispatch
+        if self.commands:
+            apps = self.command_apps()
+            for command in self.commands:
+                script_name = "%s-%s" % (
+                    self.options["control-script"],
+                    command
+                )
+                self.generate_scripts(
+                    [(
+                        script_name,
+                        "isotoma.recipe.django.commands",
+                        "run_command"
+                    )],
+                    ws,
+                    arguments="%r, %r, sys.argv" % (
+                        command,
+                        apps.get(command)
+                    ),
+                    initialization=self.initialization(),
+                    extra_paths = self.extra_paths
+                )
+                self.options.created(
+                    os.path.join(self.options["bin-directory"], script_name)
+                )
 
-            # store the old one
-            _script_template = easy_install.script_template
+        # install the collector for the instrumentation of the wsgi and asgi
+        # scripts
+        if self.options["instrument"].lower() == "true":
+            script_name = "%s-metrics" % self.options["control-script"]
+            self.generate_scripts(
+                [(
+                    script_name,
+                    "isotoma.recipe.django.instrument",
+                    "collect"
+                )],
+                ws,
+                arguments=self.path_code(self.instrument["socket"]),
+                extra_paths = self.extra_paths
+            )
+            self.options.created(
+                os.path.join(self.options["bin-directory"], script_name)
+            )
+
+        # install the wsgi and asgi scripts if required
+        for interface in ("wsgi", "asgi"):
+            if self.options[interface].lower() != "true":
+                continue
 
-            # set our new template
-            easy_install.script_template = easy_install.script_header + open(
+            # the name of the script that will end up in bin-directory
+            script_name = "%s.%s" % (self.options["control-script"], interface)
+            # install the script
+            # we need a custom template, rather than the standard buildout one
+            template = open(
                 os.path.join(os.path.dirname(__file__), "templates/wsgi.tmpl")
-            ).read() 
+            ).read() + self.wsgi_finalization(interface).replace("%", "%%")
 
             project_real_path = os.path.realpath(project_dir)
 
-            easy_install.scripts(
-                [(
-                    wsgi_name,
-                    "django.core.wsgi",
-                    "get_wsgi_application"
-                )],
+            if self.options["wsgi-checks"].lower() == "true":
+                factory = ("isotoma.recipe.django.wsgi", "get_application")
+                arguments = "%r, %s, %r" % (
+                    interface,
+                    self.path_code(self.options["wsgi-checks-record"]),
+                    self.fingerprint()
+                )
+            else:
+                factory = (
+                    "django.core.%s" % interface,
+                    "get_%s_application" % interface
+                )
+                arguments = ""
+
+            self.generate_scripts(
+                [(script_name, ) + factory],
                 ws,
-                self.options['executable'],
-                self.options['bin-directory'],
-                arguments="",
+                template=template,
+                arguments=arguments,
                 initialization=self.initialization(),
                 extra_paths = [project_real_path] + self.extra_paths
             )
-            zc.buildout.easy_install.script_template = _script_template
+
+            self.options.created(
+                os.path.join(self.options["bin-directory"], script_name)
+            )
+
+        if self.servers:
+            self.install_server_configs()
 
         # add the created scripts to the buildout installed stuff, so they get
         # removed correctly
@@ -223,6 +1122,409 @@ class Recipe(zc.recipe.egg.Egg):
             ),
         )
 
+    def install_server_configs(self):
+        """ Write the configurations of the server-config application
+        servers next to the wsgi script """
+        bin_dir = self.options["bin-directory"]
+        control_script = self.options["control-script"]
+        script_name = "%s.wsgi" % control_script
+        settings = self.server_settings
+        description = serverconfig.describe(
+            serverconfig.cpu_count(),
+            serverconfig.memory()
+        )
+
+        if "gunicorn" in self.servers:
+            # gunicorn imports the application by module name, so a module
+            # in the part directory loads the script for it
+            container_dir = self.make_part_directory()
+            module_name = "%s_wsgiapp" % re.sub(r"\W", "_", self.name)
+            module_path = os.path.join(container_dir, "%s.py" % module_name)
+            self.write_file(module_path, serverconfig.LOADER_TEMPLATE % {
+                "name": script_name,
+                "base": self.module_base_code(container_dir),
+                "script": self.module_path_code(
+                    os.path.join(bin_dir, script_name)
+                ),
+            })
+
+            config_path = os.path.join(
+                bin_dir,
+                "%s.gunicorn.conf.py" % control_script
+            )
+            self.write_file(config_path, serverconfig.gunicorn_config(
+                settings,
+                description,
+                self.module_base_code(bin_dir),
+                self.module_path_code(container_dir),
+                "%s:application" % module_name
+            ))
+            self.options.created(module_path, config_path)
+
+        if "uwsgi" in self.servers:
+            config_path = os.path.join(
+                bin_dir,
+                "%s.uwsgi.ini" % control_script
+            )
+            self.write_file(config_path, serverconfig.uwsgi_config(
+                settings,
+                description,
+                script_name
+            ))
+            self.options.created(config_path)
+
+        self.log.info(
+            "Sized the server configuration for %s: %d workers of %d "
+            "threads" % (description, settings["workers"], settings["threads"])
+        )
+
+    def configure_path_mode(self, ws):
+        """ Return the working set to generate the scripts with. Unless
+        path-mode is "eggs", the unpacked distributions are collapsed into a
+        single path entry in the part directory: a farm of symlinks, or an
+        index of module locations read by a meta path finder """
+        mode = self.options["path-mode"]
+        if mode == "eggs":
+            return ws
+
+        dists = [dist for dist in ws if os.path.isdir(dist.location)]
+        # zipped eggs stay on sys.path as they are
+        zipped = [dist.location for dist in ws if dist not in dists]
+
+        container_dir = self.make_part_directory()
+
+        if mode == "farm":
+            farm_dir = os.path.join(container_dir, "site-packages")
+            links = paths.farm_links(dists)
+            if self.relative_paths is not None:
+                links = paths.relative_links(
+                    farm_dir,
+                    links,
+                    self.relative_paths
+                )
+            if paths.build_farm(farm_dir, links):
+                self.changed_files.append(farm_dir)
+            self.options.created(farm_dir)
+            self.path_entries = [farm_dir] + zipped
+        else:
+            module_name = "%s_pathindex" % re.sub(r"\W", "_", self.name)
+            module_path = os.path.join(container_dir, "%s.py" % module_name)
+            index_path = os.path.join(container_dir, "%s.json" % module_name)
+
+            self.write_file(module_path, open(
+                os.path.join(os.path.dirname(__file__), "pathindex.py")
+            ).read())
+            index = paths.path_index(dists)
+            if self.relative_paths is not None:
+                index = paths.relative_index(
+                    container_dir,
+                    index,
+                    self.relative_paths
+                )
+            self.write_file(index_path, json.dumps(
+                index,
+                indent=4,
+                sort_keys=True
+            ))
+            self.options.created(module_path, index_path)
+
+            self.path_entries = [container_dir] + zipped
+            self.path_initialization = "import %s\n%s.install()\n" % (
+                module_name,
+                module_name
+            )
+
+        return WorkingSet([])
+
+    def insert_preload_step(self, name):
+        """ Add a wsgi-preload step unless it is already configured, before
+        any requests so that they find its work done """
+        names = [preload.parse_step(step)[0] for step in self.wsgi_preload]
+        if name in names:
+            return
+        if "url" in names:
+            position = names.index("url")
+        else:
+            position = len(names)
+        self.wsgi_preload.insert(position, name)
+
+    def source_paths(self, project_dir):
+        """ The project package, the extra-paths and the top level packages
+        and modules of every distribution in the working set """
+        targets = [os.path.realpath(project_dir)] + self.extra_paths
+        for dist in self.get_working_set():
+            if not os.path.isdir(dist.location):
+                continue
+            for name in paths.top_level_names(dist):
+                module = os.path.join(dist.location, name)
+                if os.path.isdir(module):
+                    targets.append(module)
+                else:
+                    targets.append(module + ".py")
+        return targets
+
+    def compile_messages(self, project_dir):
+        """ Compile the gettext catalogs of the project package, the
+        extra-paths and every distribution in the working set, in
+        parallel """
+        msgfmt = catalogs.find_msgfmt()
+        if msgfmt is None:
+            self.log.warning(
+                "Not compiling messages: msgfmt was not found on the PATH, "
+                "install GNU gettext"
+            )
+            return
+
+        compiled, skipped, failures, seconds = catalogs.compile_paths(
+            self.source_paths(project_dir),
+            msgfmt,
+            int(self.options.get("compilemessages-workers", 0)) or None
+        )
+
+        for path, error in failures:
+            self.log.warning("Could not compile %s: %s" % (path, error))
+        self.log.info(
+            "Compiled %d catalogs, skipped %d up to date and failed on %d in "
+            "%.2fs" % (compiled, skipped, len(failures), seconds)
+        )
+
+    def compile_bytecode(self, project_dir):
+        """ Precompile the project package, the extra-paths and the modules
+        of every distribution in the working set, in parallel """
+        executable = os.path.realpath(self.options["executable"])
+        if executable != os.path.realpath(sys.executable):
+            self.log.warning(
+                "Not compiling bytecode: the scripts run %s but buildout is "
+                "running %s" % (executable, sys.executable)
+            )
+            return
+
+        targets = self.source_paths(project_dir)
+
+        manifest_path = os.path.join(
+            self.make_part_directory(),
+            "bytecode.json"
+        )
+        manifest = {}
+        if os.path.exists(manifest_path):
+            manifest = json.load(open(manifest_path))
+
+        compiled, skipped, failures, seconds = bytecode.compile_paths(
+            targets,
+            manifest,
+            int(self.options.get("compile-workers", 0)) or None
+        )
+
+        manifest_file = open(manifest_path, "w")
+        json.dump(manifest, manifest_file)
+        manifest_file.close()
+        self.options.created(manifest_path)
+
+        for path, error in failures:
+            self.log.debug("Could not compile %s: %s" % (path, error))
+        self.log.info(
+            "Compiled %d files, skipped %d unchanged and failed on %d in "
+            "%.2fs" % (compiled, skipped, len(failures), seconds)
+        )
+
+    def path_code(self, path, join="join", base="base"):
+        """ Return the code for path in a generated script: a literal, or
+        with relative-paths, an expression joining it to the buildout
+        directory the script finds from its own location (the base and join
+        names easy_install defines), if it lies within the buildout """
+        if path is None or self.relative_paths is None:
+            return repr(path)
+        relative = os.path.relpath(path, self.relative_paths)
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            return repr(path)
+        return "%s(%s, %r)" % (join, base, relative)
+
+    def module_path_code(self, path):
+        """ Return the code for path in a generated module, such as the
+        settings module, which finds the buildout directory with the code of
+        module_base_code """
+        return self.path_code(path, "_os.path.join", "_base")
+
+    def module_base_code(self, directory):
+        """ Return the code that finds the buildout directory from a module
+        in directory, for relative-paths """
+        if self.relative_paths is None:
+            return ""
+        relative = os.path.relpath(directory, self.relative_paths)
+        if relative == os.curdir:
+            depth = 0
+        else:
+            depth = len(relative.split(os.sep))
+        return (
+            "import os as _os\n"
+            "_base = _os.path.dirname(_os.path.abspath(_os.path.realpath("
+            "__file__)))\n" +
+            "_base = _os.path.dirname(_base)\n" * depth
+        )
+
+    def generate_scripts(self, reqs, ws, template=None, **kwargs):
+        """ Generate scripts with easy_install into a staging directory next
+        to the bin-directory, then move each one into place only if its
+        content differs from the script that is already there """
+        bin_dir = self.options["bin-directory"]
+        staging_dir = tempfile.mkdtemp(
+            prefix=".%s-" % self.name,
+            dir=os.path.dirname(os.path.abspath(bin_dir))
+        )
+
+        # easy_install reports every script it writes, but the staged copies
+        # are not interesting, so we report the ones that change ourselves
+        easy_install_log = logging.getLogger("zc.buildout.easy_install")
+        _log_level = easy_install_log.level
+        _script_template = easy_install.script_template
+
+        if self.path_entries:
+            kwargs["extra_paths"] = self.path_entries + [
+                path for path in kwargs.get("extra_paths", [])
+                if path not in self.path_entries
+            ]
+        if self.path_initialization:
+            kwargs["initialization"] = \
+                self.path_initialization + kwargs.get("initialization", "")
+        if self.relative_paths is not None:
+            kwargs["relative_paths"] = self.relative_paths
+
+        try:
+            easy_install_log.setLevel(logging.WARNING)
+            if template is not None:
+                easy_install.script_template = \
+                    easy_install.script_header + template
+
+            generated = easy_install.scripts(
+                reqs,
+                ws,
+                self.options["executable"],
+                staging_dir,
+                **kwargs
+            )
+
+            for staged in generated:
+                path = os.path.join(bin_dir, os.path.basename(staged))
+                if os.path.exists(path) and \
+                        open(path, "rb").read() == open(staged, "rb").read():
+                    continue
+                os.rename(staged, path)
+                self.changed_files.append(path)
+                self.log.info("Generated script %r." % path)
+        finally:
+            easy_install.script_template = _script_template
+            easy_install_log.setLevel(_log_level)
+            shutil.rmtree(staging_dir)
+
+    def write_file(self, path, contents):
+        """ Atomically replace path with contents, unless it already holds
+        exactly that content. Returns True if the file was written """
+        if os.path.exists(path) and open(path, "rb").read() == contents:
+            return False
+
+        fd, temp_path = tempfile.mkstemp(
+            prefix=".%s." % os.path.basename(path),
+            dir=os.path.dirname(path)
+        )
+        try:
+            temp_file = os.fdopen(fd, "wb")
+            temp_file.write(contents)
+            temp_file.close()
+            os.chmod(temp_path, 0644)
+            os.rename(temp_path, path)
+        except:
+            os.remove(temp_path)
+            raise
+
+        self.changed_files.append(path)
+        return True
+
+    def report_changed_files(self):
+        """ Log the generated files that changed during this run and list them
+        in parts/<name>/changed-files for deploy tooling to inspect """
+        self.make_part_directory()
+        path = os.path.join(self.part_directory, "changed-files")
+        self.options.created(path)
+
+        report = open(path, "w")
+        for changed in self.changed_files:
+            report.write("%s\n" % changed)
+        report.close()
+
+        if self.changed_files:
+            self.log.info(
+                "Changed files: %s" % ", ".join(self.changed_files)
+            )
+        else:
+            self.log.info("No generated files changed")
+
+    def wsgi_finalization(self, interface="wsgi"):
+        """ Return the code that the wsgi (or asgi) script runs once the
+        application has been created """
+        finalization = ""
+
+        if self.wsgi_preload:
+            # the preload steps drive a wsgi application; for asgi they make
+            # their own where they need one
+            finalization += textwrap.dedent("""
+            import isotoma.recipe.django.preload
+            isotoma.recipe.django.preload.preload(%s, %r)
+            """) % (
+                interface == "wsgi" and "application" or "None",
+                self.wsgi_preload
+            )
+
+        if interface == "wsgi" and \
+                self.options["wsgi-static"].lower() == "true":
+            max_age = self.options.get("wsgi-static-max-age")
+            finalization += textwrap.dedent("""
+            import isotoma.recipe.django.staticserve
+            application = isotoma.recipe.django.staticserve.StaticFiles(
+                application, %s, %r, %r)
+            """) % (
+                self.path_code(
+                    self.options.get("wsgi-static-root") or
+                    self.options.get("static-root")
+                ),
+                self.options.get("wsgi-static-url"),
+                int(max_age) if max_age else None,
+            )
+
+        if self.options["instrument"].lower() == "true":
+            # ASGI servers need a coroutine function, which only python 3
+            # can define
+            if interface == "wsgi":
+                middleware = "instrument.Instrument"
+            else:
+                middleware = "asgiinstrument.AsgiInstrument"
+            finalization += textwrap.dedent("""
+            import isotoma.recipe.django.%s
+            application = isotoma.recipe.django.%s(
+                application, %s, %r, %r)
+            """) % (
+                middleware.split(".")[0],
+                middleware,
+                self.path_code(self.instrument["socket"]),
+                [
+                    int(bucket) for bucket in
+                    self.instrument["buckets"].split()
+                ] or None,
+                float(self.instrument["interval"]),
+            )
+
+        if self.options["wsgi-gc-freeze"].lower() == "true":
+            finalization += textwrap.dedent("""
+            import isotoma.recipe.django.memory
+            isotoma.recipe.django.memory.freeze_heap(%r)
+            """) % (self.wsgi_gc_thresholds, )
+        elif self.wsgi_gc_thresholds:
+            finalization += textwrap.dedent("""
+            import gc
+            gc.set_threshold(*%r)
+            """) % (self.wsgi_gc_thresholds, )
+
+        return finalization
+
     def initialization(self):
         prefix = ""
 
@@ -232,9 +1534,22 @@ class Recipe(zc.recipe.egg.Egg):
             for var, value in self.environment_vars.iteritems():
                 prefix += "os.environ['%s'] = %s\n" % (var, value)
 
-        return "%s%s" % (
+        suffix = ""
+        if self.options["profile"].lower() == "true":
+            suffix += textwrap.dedent("""
+            import isotoma.recipe.django.profiling
+            isotoma.recipe.django.profiling.install(%s, %s, %r, %r, %r, %r)
+            """) % (
+                self.path_code(self.options["profile-directory"]),
+                self.path_code(self.options["profile-control"]),
+                int(self.options["profile-requests"]),
+                float(self.options["profile-window"]),
+                float(self.options["profile-interval"]),
+                self.options.get("profile-signal") or None,
+            )
+
+        return "%s%s%s" % (
             prefix,
             self.settings_import,
+            suffix,
         )
-
-    update = install
@@ -0,0 +1,186 @@
+""" A cache of resolved working sets, shared by the parts of a buildout run and
+kept on disk between runs.
+
+Resolving the eggs of a part walks the whole dependency graph, and a buildout
+with a part per site or settings variant does that again for every part with
+the same eggs. The working sets are cached by a key of everything the
+resolution depends on: the requirements, the python executable, the pinned
+versions, the index, find-links and allowed hosts, the buildout's newest,
+offline and unzip options, the eggs directories and the metadata of the
+develop eggs (the files of the .egg-info directory each egg-link points to),
+so editing a develop egg's setup.py and re-running buildout resolves afresh.
+
+Within a run the working sets are kept in memory. On disk only the
+distributions' names, versions and locations are stored, and a cached
+working set is only used if every distribution is still at its location and,
+unless the buildout is offline or not looking for newer releases, is pinned
+to the cached version, since the index may otherwise hold a newer one.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+import pkg_resources
+
+log = logging.getLogger(__name__)
+
+# the number of working sets kept in the file
+MAX_ENTRIES = 50
+
+# {key: working set} for this run
+resolved = {}
+
+
+def develop_metadata(directory):
+    """ The egg-links in the develop-eggs directory with a hash of the
+    contents of the metadata files of the eggs they point to. buildout
+    rewrites those files on every run, so their size and modification time
+    would change the key each time """
+    state = []
+    if not os.path.isdir(directory):
+        return state
+
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.endswith(".egg-link"):
+            state.append((name, ))
+            continue
+        lines = [line.strip() for line in open(path) if line.strip()]
+        if not lines:
+            continue
+        location = lines[0]
+        state.append((name, location))
+        if not os.path.isdir(location):
+            continue
+        for entry in sorted(os.listdir(location)):
+            info = os.path.join(location, entry)
+            if not entry.endswith(".egg-info") or not os.path.isdir(info):
+                continue
+            for filename in sorted(os.listdir(info)):
+                try:
+                    data = open(os.path.join(info, filename), "rb").read()
+                except (IOError, OSError):
+                    continue
+                state.append((entry, filename, hashlib.sha1(data).hexdigest()))
+    return state
+
+
+def cache_key(requirements, executable, versions, index, links, allow_hosts,
+              newest, offline, unzip, eggs_directory, develop_eggs_directory):
+    """ A hash of everything resolving requirements depends on """
+    sha = hashlib.sha1()
+    for value in (
+            sorted(requirements),
+            executable,
+            sorted(versions.items()),
+            index,
+            list(links),
+            list(allow_hosts),
+            newest,
+            offline,
+            unzip,
+            eggs_directory,
+            develop_eggs_directory,
+            develop_metadata(develop_eggs_directory)):
+        sha.update(("%r\n" % (value, )).encode("utf-8"))
+    return sha.hexdigest()
+
+
+def is_pinned(versions, name, version):
+    for pinned_name, pinned in versions.items():
+        if pinned_name.lower() == name.lower():
+            return pkg_resources.parse_version(pinned) == \
+                pkg_resources.parse_version(version)
+    return False
+
+
+def find_distribution(name, version, location, found):
+    """ The distribution at location, using found ({location: [dists]}) for
+    the locations already searched """
+    if location not in found:
+        if os.path.exists(location):
+            found[location] = list(pkg_resources.find_distributions(location))
+        else:
+            found[location] = []
+    for dist in found[location]:
+        if dist.project_name == name and dist.version == version:
+            return dist
+    return None
+
+
+def read_entries(path):
+    try:
+        return json.load(open(path))
+    except (IOError, OSError, ValueError):
+        return {}
+
+
+def write_entries(path, entries):
+    """ Write the cache file atomically, so concurrent runs never read half
+    of it """
+    try:
+        fd, temp_path = tempfile.mkstemp(
+            prefix=".%s." % os.path.basename(path),
+            dir=os.path.dirname(path)
+        )
+        output = os.fdopen(fd, "w")
+        json.dump(entries, output)
+        output.close()
+        os.rename(temp_path, path)
+    except (IOError, OSError) as e:
+        log.warning("Could not write the working set cache %s: %s" % (
+            path,
+            e
+        ))
+
+
+def lookup(path, key, versions, check_pins):
+    """ The cached working set for key, or None """
+    ws = resolved.get(key)
+    if ws is not None:
+        return ws
+
+    if path is None:
+        return None
+    entry = read_entries(path).get(key)
+    if entry is None:
+        return None
+
+    ws = pkg_resources.WorkingSet([])
+    found = {}
+    for name, version, location in entry["distributions"]:
+        if check_pins and not is_pinned(versions, name, version):
+            return None
+        dist = find_distribution(name, version, location, found)
+        if dist is None:
+            return None
+        ws.add(dist)
+
+    resolved[key] = ws
+    return ws
+
+
+def store(path, key, ws):
+    """ Cache the working set ws for key, in memory and in the file at
+    path """
+    resolved[key] = ws
+    if path is None:
+        return
+
+    entries = read_entries(path)
+    entries[key] = {
+        "time": time.time(),
+        "distributions": [
+            [dist.project_name, dist.version, dist.location]
+            for dist in ws
+        ],
+    }
+    if len(entries) > MAX_ENTRIES:
+        oldest = sorted(entries, key=lambda key: entries[key]["time"])
+        for old in oldest[:len(entries) - MAX_ENTRIES]:
+            del entries[old]
+    write_entries(path, entries)
@@ -0,0 +1,156 @@
+""" Application server configurations for the wsgi script, sized to the host
+the buildout is installed on.
+
+size() works out the settings from the number of CPUs and the memory of the
+host: 2 * CPUs + 1 workers, gunicorn's usual starting point, unless that many
+workers of worker_memory megabytes each would not fit in memory, one thread
+each, and workers recycled every 1000 requests (with a jitter of 5% so they
+do not all restart at once) to contain slow leaks. Any of these can be
+overridden. gunicorn_config() and uwsgi_config() write the settings in the
+formats of those servers.
+"""
+
+import multiprocessing
+import os
+
+DEFAULTS = {
+    "bind": "127.0.0.1:8000",
+    "workers": None,
+    "threads": "1",
+    "max-requests": "1000",
+    "max-requests-jitter": None,
+    "timeout": "30",
+    "preload": "true",
+    "worker-memory": "256",
+}
+
+SERVERS = ("gunicorn", "uwsgi")
+
+
+def cpu_count():
+    try:
+        return multiprocessing.cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+def memory():
+    """ The physical memory of the host in bytes, or None if unknown """
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def describe(cpus, total_memory):
+    description = "%d CPU%s" % (cpus, cpus != 1 and "s" or "")
+    if total_memory is None:
+        return description
+    return "%s and %.1fGB of memory" % (
+        description,
+        total_memory / float(1024 ** 3)
+    )
+
+
+def size(options, cpus=None, total_memory=None):
+    """ The server settings for options, a dict of overrides of DEFAULTS,
+    on a host with cpus CPUs and total_memory bytes of memory. Raises
+    ValueError for options that are not numbers where they should be """
+    settings = dict(DEFAULTS)
+    settings.update(options)
+
+    if cpus is None:
+        cpus = cpu_count()
+
+    worker_memory = int(settings["worker-memory"]) * 1024 * 1024
+    if settings["workers"] is None:
+        workers = 2 * cpus + 1
+        if total_memory and worker_memory:
+            workers = min(workers, total_memory // worker_memory)
+        settings["workers"] = max(1, workers)
+    else:
+        settings["workers"] = int(settings["workers"])
+
+    settings["threads"] = int(settings["threads"])
+    settings["max-requests"] = int(settings["max-requests"])
+    if settings["max-requests-jitter"] is None:
+        settings["max-requests-jitter"] = settings["max-requests"] // 20
+    else:
+        settings["max-requests-jitter"] = int(settings["max-requests-jitter"])
+    settings["timeout"] = int(settings["timeout"])
+    settings["preload"] = settings["preload"].lower() == "true"
+    settings["worker-memory"] = int(settings["worker-memory"])
+    return settings
+
+
+def gunicorn_config(settings, description, base_code, pythonpath_code, app):
+    """ A gunicorn configuration file. base_code and pythonpath_code are the
+    code of the directory holding the loader module app (see
+    Recipe.module_path_code) """
+    return GUNICORN_TEMPLATE % {
+        "description": description,
+        "base": base_code,
+        "pythonpath": pythonpath_code,
+        "app": app,
+        "bind": settings["bind"],
+        "workers": settings["workers"],
+        "threads": settings["threads"],
+        "max_requests": settings["max-requests"],
+        "max_requests_jitter": settings["max-requests-jitter"],
+        "timeout": settings["timeout"],
+        "preload": settings["preload"],
+    }
+
+
+def uwsgi_config(settings, description, script_name):
+    """ A uWSGI ini file, to be kept in the same directory as the wsgi
+    script script_name """
+    lines = [
+        "[uwsgi]",
+        "; generated by isotoma.recipe.django for %s" % description,
+        "wsgi-file = %%d%s" % script_name,
+        "http-socket = %s" % settings["bind"],
+        "master = true",
+        "processes = %d" % settings["workers"],
+    ]
+    if settings["threads"] > 1:
+        lines.append("threads = %d" % settings["threads"])
+    lines.extend([
+        "enable-threads = true",
+        "max-requests = %d" % settings["max-requests"],
+        "max-requests-delta = %d" % settings["max-requests-jitter"],
+        "harakiri = %d" % settings["timeout"],
+        "lazy-apps = %s" % (settings["preload"] and "false" or "true"),
+        "need-app = true",
+        "die-on-term = true",
+        "single-interpreter = true",
+    ])
+    return "\n".join(lines) + "\n"
+
+
+GUNICORN_TEMPLATE = """\
+# generated by isotoma.recipe.django for %(description)s
+%(base)s
+pythonpath = %(pythonpath)s
+# gunicorn reads wsgi_app from 20.1; for earlier versions pass %(app)s on the
+# command line
+wsgi_app = %(app)r
+
+bind = %(bind)r
+workers = %(workers)d
+threads = %(threads)d
+max_requests = %(max_requests)d
+max_requests_jitter = %(max_requests_jitter)d
+timeout = %(timeout)d
+preload_app = %(preload)r
+"""
+
+LOADER_TEMPLATE = """\
+# generated by isotoma.recipe.django to load %(name)s for servers that import
+# the application by module name
+%(base)s
+_script = %(script)s
+_namespace = {"__file__": _script, "__name__": __name__}
+exec(compile(open(_script).read(), _script, "exec"), _namespace)
+application = _namespace["application"]
+"""
@@ -0,0 +1,267 @@
+""" Serve static files in front of a Django WSGI application, for deployments
+without a front end server that can do it.
+
+The static root is indexed when the application is created: the size, mtime,
+ETag, content type and precompressed variants (.br and .gz files written
+alongside, see the collectstatic option) of every file. Requests for indexed
+files are answered without reaching Django's URL resolver or middleware,
+with support for conditional and single range requests, and the body is sent
+with wsgi.file_wrapper when the server provides it. Anything else, including
+files added to the static root after start up, is passed to the application.
+"""
+
+import logging
+import mimetypes
+import os
+import time
+from email.utils import formatdate, parsedate
+
+log = logging.getLogger(__name__)
+
+BLOCK_SIZE = 64 * 1024
+
+# encodings of precompressed variants, in order of preference
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+class StaticFile(object):
+
+    def __init__(self, path, stat, variants):
+        self.path = path
+        self.size = stat.st_size
+        self.mtime = int(stat.st_mtime)
+        self.etag = '"%x-%x"' % (self.mtime, self.size)
+        self.last_modified = formatdate(self.mtime, usegmt=True)
+        self.content_type = mimetypes.guess_type(path)[0] or \
+            "application/octet-stream"
+        # {encoding: (path, size)}
+        self.variants = variants
+
+
+def accepted_encodings(header):
+    """ The content codings an Accept-Encoding header allows """
+    accepted = set()
+    for part in header.split(","):
+        params = part.strip().split(";")
+        coding = params[0].strip().lower()
+        quality = 1.0
+        for param in params[1:]:
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+        if coding and quality > 0:
+            accepted.add(coding)
+    return accepted
+
+
+def parse_range(header, size):
+    """ Return (start, end) for a single "bytes=" range, None if the header
+    cannot be used, or False if the range cannot be satisfied """
+    units, _, ranges = header.partition("=")
+    if units.strip() != "bytes" or "," in ranges:
+        return None
+    first, _, last = ranges.strip().partition("-")
+    try:
+        if not first:
+            length = int(last)
+            if length == 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if last and start > end:
+        # a last byte before the first makes the header invalid, and it is
+        # ignored (RFC 7233, section 2.1)
+        return None
+    if start >= size:
+        return False
+    return start, min(end, size - 1)
+
+
+def read_range(path, start, length):
+    f = open(path, "rb")
+    try:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(BLOCK_SIZE, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+class StaticFiles(object):
+    """ WSGI middleware serving the files under root at the url prefix. root
+    and url default to the STATIC_ROOT and STATIC_URL settings """
+
+    def __init__(self, application, root=None, url=None, max_age=None):
+        self.application = application
+
+        if root is None or url is None:
+            from django.conf import settings
+            root = root or settings.STATIC_ROOT
+            url = url or settings.STATIC_URL
+
+        self.prefix = url or ""
+        if not self.prefix.endswith("/"):
+            self.prefix += "/"
+        self.root = root
+        self.max_age = max_age
+
+        self.files = {}
+        if not url or "://" in self.prefix or not root or \
+                not os.path.isdir(root):
+            log.warning(
+                "Not serving static files from %r at %r" % (root, url)
+            )
+        else:
+            self.build_index()
+
+    def build_index(self):
+        started = time.time()
+        suffixes = dict((suffix, encoding) for encoding, suffix in ENCODINGS)
+
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            names = set(filenames)
+            for filename in filenames:
+                base, suffix = os.path.splitext(filename)
+                if suffix in suffixes and base in names:
+                    # a variant of another file
+                    continue
+
+                path = os.path.join(dirpath, filename)
+                variants = {}
+                for encoding, suffix in ENCODINGS:
+                    if filename + suffix in names:
+                        variant = path + suffix
+                        variants[encoding] = (
+                            variant,
+                            os.stat(variant).st_size
+                        )
+
+                url_path = os.path.relpath(path, self.root)
+                url_path = url_path.replace(os.sep, "/")
+                self.files[url_path] = StaticFile(
+                    path,
+                    os.stat(path),
+                    variants
+                )
+
+        log.info("Indexed %d static files in %.1fms" % (
+            len(self.files),
+            (time.time() - started) * 1000
+        ))
+
+    def __call__(self, environ, start_response):
+        path = environ.get("PATH_INFO", "")
+        if not path.startswith(self.prefix):
+            return self.application(environ, start_response)
+
+        static_file = self.files.get(path[len(self.prefix):])
+        if static_file is None:
+            return self.application(environ, start_response)
+
+        return self.serve(static_file, environ, start_response)
+
+    def not_modified(self, static_file, etag, environ):
+        if_none_match = environ.get("HTTP_IF_NONE_MATCH")
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(",")]
+            return "*" in tags or etag in tags or "W/" + etag in tags
+
+        if_modified_since = environ.get("HTTP_IF_MODIFIED_SINCE")
+        if if_modified_since:
+            parsed = parsedate(if_modified_since.split(";")[0])
+            if parsed is not None:
+                from calendar import timegm
+                return static_file.mtime <= timegm(parsed)
+
+        return False
+
+    def serve(self, static_file, environ, start_response):
+        method = environ.get("REQUEST_METHOD", "GET")
+        if method not in ("GET", "HEAD"):
+            start_response("405 Method Not Allowed", [
+                ("Content-Type", "text/plain"),
+                ("Allow", "GET, HEAD"),
+                ("Content-Length", "0"),
+            ])
+            return []
+
+        headers = [
+            ("Content-Type", static_file.content_type),
+            ("Last-Modified", static_file.last_modified),
+            ("Accept-Ranges", "bytes"),
+        ]
+        if static_file.variants:
+            headers.append(("Vary", "Accept-Encoding"))
+        if self.max_age is not None:
+            headers.append(("Cache-Control", "max-age=%d" % self.max_age))
+
+        # ranges are always served from the uncompressed file
+        range_header = environ.get("HTTP_RANGE")
+        if_range = environ.get("HTTP_IF_RANGE")
+        if if_range is not None and if_range != static_file.etag and \
+                if_range != static_file.last_modified:
+            range_header = None
+
+        body_path, size, etag = \
+            static_file.path, static_file.size, static_file.etag
+        if static_file.variants and range_header is None:
+            accepted = accepted_encodings(
+                environ.get("HTTP_ACCEPT_ENCODING", "")
+            )
+            for encoding, suffix in ENCODINGS:
+                if encoding in accepted and encoding in static_file.variants:
+                    body_path, size = static_file.variants[encoding]
+                    etag = static_file.etag[:-1] + '-%s"' % encoding
+                    headers.append(("Content-Encoding", encoding))
+                    break
+        headers.append(("ETag", etag))
+
+        if self.not_modified(static_file, etag, environ):
+            start_response("304 Not Modified", [
+                header for header in headers
+                if header[0] in ("ETag", "Last-Modified", "Vary",
+                                 "Cache-Control")
+            ])
+            return []
+
+        if range_header is not None:
+            byte_range = parse_range(range_header, size)
+            if byte_range is False:
+                start_response("416 Requested Range Not Satisfiable", [
+                    ("Content-Type", "text/plain"),
+                    ("Content-Range", "bytes */%d" % size),
+                    ("Content-Length", "0"),
+                ])
+                return []
+            if byte_range is not None:
+                start, end = byte_range
+                headers.append(("Content-Range", "bytes %d-%d/%d" % (
+                    start,
+                    end,
+                    size
+                )))
+                headers.append(("Content-Length", str(end - start + 1)))
+                start_response("206 Partial Content", headers)
+                if method == "HEAD":
+                    return []
+                return read_range(body_path, start, end - start + 1)
+
+        headers.append(("Content-Length", str(size)))
+        start_response("200 OK", headers)
+        if method == "HEAD":
+            return []
+
+        file_wrapper = environ.get("wsgi.file_wrapper")
+        if file_wrapper is not None:
+            return file_wrapper(open(body_path, "rb"), BLOCK_SIZE)
+        return read_range(body_path, 0, size)
@@ -0,0 +1,146 @@
+""" Wrap the configured template loaders in Django's cached loader, and find
+every template they can load so that a preload step can compile them all.
+
+cached_loaders() is called at the end of the settings module the recipe
+generates, with the settings so far, and returns the settings to change: the
+loaders of each DjangoTemplates engine in TEMPLATES (Django 1.8 and later),
+or TEMPLATE_LOADERS before that, wrapped in the cached loader unless they
+already are.
+"""
+
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+CACHED_LOADER = "django.template.loaders.cached.Loader"
+DJANGO_BACKEND = "django.template.backends.django.DjangoTemplates"
+
+# Django's defaults, which apply when no loaders are configured
+FILESYSTEM_LOADER = "django.template.loaders.filesystem.Loader"
+APP_DIRECTORIES_LOADER = "django.template.loaders.app_directories.Loader"
+
+
+def is_cached(loaders):
+    for loader in loaders:
+        if isinstance(loader, (list, tuple)):
+            loader = loader[0]
+        if loader == CACHED_LOADER:
+            return True
+    return False
+
+
+def cached_loaders(settings):
+    """ The settings to change, in the settings module namespace settings,
+    for the template loaders to be cached """
+    templates = settings.get("TEMPLATES")
+    if templates:
+        changed = []
+        for backend in templates:
+            backend = dict(backend)
+            if backend.get("BACKEND") == DJANGO_BACKEND:
+                options = dict(backend.get("OPTIONS") or {})
+                loaders = options.get("loaders")
+                if not loaders:
+                    loaders = [FILESYSTEM_LOADER]
+                    if backend.get("APP_DIRS"):
+                        loaders.append(APP_DIRECTORIES_LOADER)
+                if not is_cached(loaders):
+                    loaders = [(CACHED_LOADER, list(loaders))]
+                options["loaders"] = loaders
+                backend["OPTIONS"] = options
+                # Django refuses APP_DIRS alongside explicit loaders
+                backend["APP_DIRS"] = False
+            changed.append(backend)
+        return {"TEMPLATES": changed}
+
+    loaders = settings.get("TEMPLATE_LOADERS") or (
+        FILESYSTEM_LOADER,
+        APP_DIRECTORIES_LOADER,
+    )
+    if is_cached(loaders):
+        return {}
+    return {"TEMPLATE_LOADERS": ((CACHED_LOADER, tuple(loaders)), )}
+
+
+def loader_directories(loader):
+    """ The directories a template loader reads from """
+    inner = getattr(loader, "loaders", None)
+    if inner is not None:
+        # the cached loader
+        directories = []
+        for inner_loader in inner:
+            directories.extend(loader_directories(inner_loader))
+        return directories
+    if hasattr(loader, "get_dirs"):
+        return list(loader.get_dirs())
+    return []
+
+
+def template_directories():
+    """ The template directories of the configured loaders, in the order
+    they are searched """
+    try:
+        from django.template import engines
+    except ImportError:
+        engines = None
+
+    directories = []
+    if engines is not None:
+        for backend in engines.all():
+            engine = getattr(backend, "engine", None)
+            if engine is None:
+                continue
+            backend_directories = []
+            for loader in engine.template_loaders:
+                backend_directories.extend(loader_directories(loader))
+            if not backend_directories:
+                # before loaders could list their directories
+                backend_directories = list(backend.template_dirs)
+            directories.extend(backend_directories)
+    else:
+        from django.conf import settings
+        from django.template.loaders.app_directories import \
+            app_template_dirs
+        directories.extend(settings.TEMPLATE_DIRS)
+        directories.extend(app_template_dirs)
+
+    unique = []
+    for directory in directories:
+        directory = str(directory)
+        if directory not in unique:
+            unique.append(directory)
+    return unique
+
+
+def template_names(directory):
+    for dirpath, dirnames, filenames in os.walk(directory):
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+        for filename in filenames:
+            if not filename.startswith("."):
+                path = os.path.relpath(os.path.join(dirpath, filename),
+                                       directory)
+                yield path.replace(os.sep, "/")
+
+
+def compile_all():
+    """ Load every template in the template directories through the
+    configured loaders, logging those that fail. Returns (compiled,
+    failed) """
+    from django.template.loader import get_template
+
+    seen = set()
+    compiled = failed = 0
+    for directory in template_directories():
+        for name in template_names(directory):
+            if name in seen:
+                continue
+            seen.add(name)
+            try:
+                get_template(name)
+            except Exception as e:
+                failed += 1
+                log.warning("Could not compile template %s: %s" % (name, e))
+            else:
+                compiled += 1
+    return compiled, failed
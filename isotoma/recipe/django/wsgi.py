@@ -1,20 +1,184 @@
+""" An application factory for the wsgi and asgi scripts that runs Django's
+system checks once rather than in every worker.
+
+get_application() creates the application with Django's own factory (which
+sets Django up), then computes a fingerprint of the code and settings it was
+set up with: the fingerprint of the buildout part, the size and modification
+time of every module loaded by then (the settings modules, the installed apps
+and their models) and the values of the settings. If record is the path of a
+file holding the same fingerprint the checks are skipped, otherwise they are
+run and, when they pass, the fingerprint is written to the file. A
+preloading master therefore checks for the workers it forks, and workers
+started later against unchanged code skip the checks altogether.
+
+The application is kept for the life of the process, so importing the script
+again (under another name, or after mod_wsgi reloads it) reuses it.
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sys
+import tempfile
+
+log = logging.getLogger(__name__)
+
+# {interface: application}
+applications = {}
+
+# the fingerprints checked by this process
+checked = set()
+
+
+def create_application(interface):
+    if interface == "asgi":
+        from django.core.asgi import get_asgi_application
+        return get_asgi_application()
+
+    try:
+        from django.core.wsgi import get_wsgi_application
+    except ImportError:
+        # before Django 1.4
+        from django.core.handlers.wsgi import WSGIHandler
+        return WSGIHandler()
+    return get_wsgi_application()
+
+
+def fingerprint(build_fingerprint=None):
+    """ A hash of the code loaded and the settings in use """
+    from django.conf import settings
+
+    sha = hashlib.sha1()
+    sha.update(("build %s\n" % build_fingerprint).encode("utf-8"))
+
+    import django
+    sha.update(("django %r\n" % (django.VERSION, )).encode("utf-8"))
+
+    for name, module in sorted(list(sys.modules.items())):
+        path = getattr(module, "__file__", None)
+        if not path:
+            continue
+        if path.endswith((".pyc", ".pyo")) and os.path.exists(path[:-1]):
+            # python 2 names the source or the bytecode, depending on which
+            # it loaded
+            path = path[:-1]
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        sha.update(("module %s %s %d %d\n" % (
+            name,
+            path,
+            stat.st_size,
+            stat.st_mtime
+        )).encode("utf-8"))
+
+    for name in sorted(dir(settings)):
+        if name.isupper():
+            # the addresses of objects differ between processes
+            value = re.sub(
+                r" at 0x[0-9a-fA-F]+", "",
+                repr(getattr(settings, name))
+            )
+            sha.update(("setting %s = %s\n" % (name, value)).encode("utf-8"))
+
+    return sha.hexdigest()
+
+
+def run_checks():
+    """ Run the system checks (or the model validation before Django 1.7),
+    logging the warnings and raising an error for anything serious """
+    try:
+        from django.core import checks
+        checks.run_checks
+    except (ImportError, AttributeError):
+        from django.core.management import ManagementUtility
+        utility = ManagementUtility()
+        command = utility.fetch_command("runserver")
+        command.validate()
+        return
+
+    from django.core.management.base import SystemCheckError
+
+    messages = [
+        message for message in checks.run_checks()
+        if not message.is_silenced()
+    ]
+    serious = [message for message in messages if message.is_serious()]
+    for message in messages:
+        if message not in serious:
+            log.warning(str(message))
+    if serious:
+        raise SystemCheckError(
+            "System check identified some issues:\n%s" % "\n".join(
+                str(message) for message in serious
+            )
+        )
+
+
+def read_record(record):
+    try:
+        return open(record).read().strip()
+    except (IOError, OSError):
+        return None
+
+
+def write_record(record, value):
+    """ Write the fingerprint atomically, so workers starting at the same
+    time never read half of it """
+    try:
+        directory = os.path.dirname(record)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        fd, temp_path = tempfile.mkstemp(
+            prefix=".%s." % os.path.basename(record),
+            dir=directory
+        )
+        os.write(fd, ("%s\n" % value).encode("ascii"))
+        os.close(fd)
+        os.rename(temp_path, record)
+    except (IOError, OSError) as e:
+        log.warning("Could not record the system checks in %s: %s" % (
+            record,
+            e
+        ))
+
+
+def check(record=None, build_fingerprint=None):
+    """ Run the system checks unless they passed, in this process or the one
+    that wrote record, with the code and settings in use now """
+    current = fingerprint(build_fingerprint)
+    if current in checked:
+        return
+    if record is not None and read_record(record) == current:
+        log.debug("Skipping the system checks, fingerprint %s is unchanged"
+                  % current)
+        checked.add(current)
+        return
+
+    run_checks()
+    checked.add(current)
+    if record is not None:
+        write_record(record, current)
+
+
+def get_application(interface="wsgi", record=None, build_fingerprint=None,
+                    checks=True):
+    """ The wsgi (or asgi) application, checked and created once per
+    process """
+    application = applications.get(interface)
+    if application is None:
+        application = create_application(interface)
+        if checks:
+            check(record, build_fingerprint)
+        applications[interface] = application
+    return application
 
-# mostly taken from here: http://blog.dscpl.com.au/2010/03/improved-wsgi-script-for-use-with.html
 
 def main(settings):
-    
-    import django.core.management
-    django.core.management.setup_environ(settings)
-    utility = django.core.management.ManagementUtility()
-    command = utility.fetch_command('runserver')
-    
-    command.validate()
-    
-    import django.conf
-    import django.utils
-    
-    django.utils.translation.activate(django.conf.settings.LANGUAGE_CODE)
-    
-    import django.core.handlers.wsgi
-    
-    return django.core.handlers.wsgi.WSGIHandler()
\ No newline at end of file
+    """ The wsgi application for the settings module. Kept for the scripts
+    of earlier versions of the recipe, which called it with the settings
+    module; use get_application instead """
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", settings.__name__)
+    return get_application()
@@ -0,0 +1,66 @@
+""" Load a generated asgi script and send it an HTTP request in-process, the
+way an ASGI server would, exiting with a non-zero status if the response is a
+server error::
+
+    bin/python test/asgi_client.py bin/django.asgi /
+"""
+
+import asyncio
+import sys
+
+
+def load_application(script):
+    namespace = {"__file__": script, "__name__": "__asgi__"}
+    code = compile(open(script).read(), script, "exec")
+    exec(code, namespace)
+    return namespace["application"]
+
+
+async def request(application, path):
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("utf-8"),
+        "query_string": query.encode("utf-8"),
+        "root_path": "",
+        "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0),
+        "server": ("localhost", 80),
+    }
+    requests = [{"type": "http.request", "body": b"", "more_body": False}]
+    response = {"body": b""}
+
+    async def receive():
+        if requests:
+            return requests.pop(0)
+        # the request has been read, wait for the response to be sent
+        await asyncio.Future()
+
+    async def send(message):
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+
+    await application(scope, receive, send)
+    return response["status"], response["body"]
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit("usage: %s SCRIPT PATH" % sys.argv[0])
+
+    application = load_application(sys.argv[1])
+    status, body = asyncio.run(request(application, sys.argv[2]))
+    print("%s %d (%d bytes)" % (sys.argv[2], status, len(body)))
+    if status >= 500:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
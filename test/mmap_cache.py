@@ -0,0 +1,56 @@
+""" Check the mmap cache backend stores values with the timeouts Django
+allows, exiting with a non-zero status on the first failure::
+
+    bin/python test/mmap_cache.py
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+import django
+from isotoma.recipe.django.mmapcache import MmapCache
+
+
+def check(description, value, expected):
+    if value != expected:
+        print("FAIL %s: %r, expected %r" % (description, value, expected))
+        sys.exit(1)
+    print("ok   %s" % description)
+
+
+def main():
+    directory = tempfile.mkdtemp()
+    try:
+        cache = MmapCache(os.path.join(directory, "cache.mmap"), {
+            "OPTIONS": {"SIZE": 1024 * 1024},
+        })
+        cache.set("default", "a")
+        check("default timeout", cache.get("default"), "a")
+        cache.set("seconds", "b", 60)
+        check("timeout in seconds", cache.get("seconds"), "b")
+
+        if django.VERSION >= (1, 6):
+            # None is "never expire"
+            cache.set("never", "c", None)
+            check("None timeout", cache.get("never"), "c")
+            check("None timeout never expires", cache.expiry(None), 0)
+
+            never = MmapCache(os.path.join(directory, "never.mmap"), {
+                "TIMEOUT": None,
+                "OPTIONS": {"SIZE": 1024 * 1024},
+            })
+            never.set("key", "d")
+            check("TIMEOUT None", never.get("key"), "d")
+    finally:
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+""" Send a generated wsgi script a request for a view that makes an N+1 query
+and check that query-accounting reports it, exiting with a non-zero status if
+it does not::
+
+    bin/python test/query_accounting.py bin/django.wsgi /n-plus-one/
+
+The request goes through the wsgi handler because before Django 1.7 the
+accounting is installed by the first request, and management commands are
+not accounted for.
+"""
+
+import logging
+import sys
+
+from relocated import load_application, request
+
+
+class Reports(logging.Handler):
+
+    def __init__(self):
+        logging.Handler.__init__(self)
+        self.reports = []
+
+    def emit(self, record):
+        report = getattr(record, "queries", None)
+        if report is not None:
+            self.reports.append(report)
+
+
+def main():
+    script, path = sys.argv[1:3]
+
+    application = load_application(script)
+    reports = Reports()
+    # on the root logger, so the check does not create the report's logger
+    # before Django configures LOGGING, which would disable it
+    logging.getLogger().addHandler(reports)
+
+    status = request(application, path)
+    print("%s %s" % (path, status))
+    if int(status.split()[0]) >= 500:
+        sys.exit(1)
+
+    for report in reports.reports:
+        print("%s: %s" % (report["label"], ", ".join(report["exceeded"])))
+        if report["label"].endswith(path) and "repeats" in report["exceeded"]:
+            print("%d times: %s" % (
+                report["repeated"][0]["count"],
+                report["repeated"][0]["shape"]
+            ))
+            if report["repeated"][0]["count"] >= 20:
+                sys.exit(0)
+
+    print("The N+1 query was not reported")
+    sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+""" Load a generated wsgi script from a copy of the buildout and send it a
+request, exiting with a non-zero status if the response is a server error, if
+the project, Django or the settings were imported from the original buildout
+rather than the copy, or if the script put the original's bin directory on
+the PATH::
+
+    cp -a . /tmp/copy
+    cd /tmp/copy && bin/python test/relocated.py bin/django.wsgi /original /
+"""
+
+import os
+import sys
+
+
+def load_application(script):
+    namespace = {"__file__": script, "__name__": "__wsgi__"}
+    code = compile(open(script).read(), script, "exec")
+    exec(code, namespace)
+    return namespace["application"]
+
+
+def request(application, path):
+    from wsgiref.util import setup_testing_defaults
+
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path}
+    setup_testing_defaults(environ)
+
+    status = []
+
+    def start_response(response_status, headers, exc_info=None):
+        status.append(response_status)
+        return lambda data: None
+
+    response = application(environ, start_response)
+    try:
+        for data in response:
+            pass
+    finally:
+        if hasattr(response, "close"):
+            response.close()
+    return status[0]
+
+
+def main():
+    script, original, path = sys.argv[1:4]
+    original = os.path.join(os.path.realpath(original), "")
+
+    application = load_application(script)
+    status = request(application, path)
+    print("%s %s" % (path, status))
+
+    failed = int(status.split()[0]) >= 500
+    modules = ["django", "test_project", os.environ["DJANGO_SETTINGS_MODULE"]]
+    for name in modules:
+        location = os.path.realpath(sys.modules[name].__file__)
+        print("%s %s" % (name, location))
+        if location.startswith(original):
+            failed = True
+
+    path = os.environ["PATH"].split(os.pathsep)[0]
+    print("PATH %s" % path)
+    if os.path.join(os.path.realpath(path), "").startswith(original):
+        failed = True
+
+    sys.exit(failed and 1 or 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+""" Check the range parsing and url handling of the wsgi-static layer, exiting
+with a non-zero status on the first failure::
+
+    bin/python test/static_files.py
+"""
+
+import os
+import sys
+
+from isotoma.recipe.django.staticserve import StaticFiles, parse_range
+
+STATIC_ROOT = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)),
+    "test_project",
+    "static"
+)
+
+RANGES = [
+    ("bytes=0-0", 10, (0, 0)),
+    ("bytes=0-4", 10, (0, 4)),
+    ("bytes=5-", 10, (5, 9)),
+    ("bytes=5-100", 10, (5, 9)),
+    ("bytes=-3", 10, (7, 9)),
+    ("bytes=-0", 10, False),
+    ("bytes=5-0", 10, None),
+    ("bytes=10-", 10, False),
+    ("bytes=0-1,3-4", 10, None),
+    ("items=0-1", 10, None),
+    ("bytes=a-b", 10, None),
+]
+
+
+def application(environ, start_response):
+    start_response("404 Not Found", [("Content-Type", "text/plain")])
+    return [b"from the application"]
+
+
+def request(app, path, **headers):
+    environ = {"REQUEST_METHOD": "GET", "PATH_INFO": path}
+    environ.update(headers)
+    status = []
+
+    def start_response(response_status, response_headers, exc_info=None):
+        status.append(response_status)
+
+    body = b"".join(app(environ, start_response))
+    return status[0], body
+
+
+def check(description, value, expected):
+    if value != expected:
+        print("FAIL %s: %r, expected %r" % (description, value, expected))
+        sys.exit(1)
+    print("ok   %s" % description)
+
+
+def main():
+    for header, size, expected in RANGES:
+        check("%s of %d bytes" % (header, size),
+              parse_range(header, size),
+              expected)
+
+    app = StaticFiles(application, STATIC_ROOT, "/static/")
+    status, body = request(app, "/static/successkid.jpg",
+                           HTTP_RANGE="bytes=0-0")
+    check("first byte", (status, len(body)), ("206 Partial Content", 1))
+    status, body = request(app, "/static/successkid.jpg",
+                           HTTP_RANGE="bytes=5-0")
+    check("reversed range", (status, len(body)), (
+        "200 OK",
+        os.path.getsize(os.path.join(STATIC_ROOT, "successkid.jpg"))
+    ))
+
+    # Django 1.4 has no STATIC_URL unless the project sets one
+    from django.conf import settings
+    if not settings.configured:
+        settings.configure()
+    for url in (None, ""):
+        app = StaticFiles(application, STATIC_ROOT, url)
+        check("url %r serves nothing" % (url, ), app.files, {})
+        status, body = request(app, "/successkid.jpg")
+        check("url %r passes requests on" % (url, ), status, "404 Not Found")
+
+
+if __name__ == "__main__":
+    main()
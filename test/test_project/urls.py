@@ -5,6 +5,7 @@ from django.conf import settings
 
 urlpatterns = patterns('',
     url('^$', direct_to_template, {'template': 'placeholder.html'}),
+    url('^n-plus-one/$', 'test_project.views.n_plus_one'),
 )
 
 # Serve media when in DEBUG mode.